@@ -7,6 +7,8 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
@@ -16,8 +18,38 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "restaurant_finder")
 
+# Restaurant dataset
+DATASET_PATH = os.getenv("DATASET_PATH", "")
+DATASET_SNAPSHOT_ENABLED = os.getenv("DATASET_SNAPSHOT_ENABLED", "True").lower() == "true"
+DATASET_SNAPSHOT_DIR = os.getenv("DATASET_SNAPSHOT_DIR", os.path.join(BASE_DIR, ".dataset_cache"))
+# Comma separated optional columns (e.g. "url,menu_url,rating_text") not kept in memory
+DATASET_DROP_COLUMNS = [c.strip() for c in os.getenv("DATASET_DROP_COLUMNS", "").split(",") if c.strip()]
+# Seconds between checks of the CSV for changes; 0 only reloads on request
+DATASET_RELOAD_INTERVAL = float(os.getenv("DATASET_RELOAD_INTERVAL", "60"))
+# Seconds between checks for a reload requested through another worker
+DATASET_RELOAD_REQUEST_POLL = float(os.getenv("DATASET_RELOAD_REQUEST_POLL", "5"))
+# Processes parsing the CSV in parallel chunks; 1 reads it in one pass, 0 uses every core
+DATASET_INGEST_WORKERS = int(os.getenv("DATASET_INGEST_WORKERS", "1"))
+# Token required by the admin reload endpoint; the endpoint is off when empty
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Search
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+SEARCH_QUEUE_DEPTH = int(os.getenv("SEARCH_QUEUE_DEPTH", "64"))
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "500"))
+SEARCH_MAX_RADIUS_KM = float(os.getenv("SEARCH_MAX_RADIUS_KM", "50"))
+SEARCH_PAGE_MAX_SIZE = int(os.getenv("SEARCH_PAGE_MAX_SIZE", "1000"))
+# Results selected and written at a time by streamed searches
+SEARCH_STREAM_BATCH = int(os.getenv("SEARCH_STREAM_BATCH", "500"))
+# Local time of the restaurants' opening hours, for "open now" (IST by default)
+TIMINGS_UTC_OFFSET_MINUTES = int(os.getenv("TIMINGS_UTC_OFFSET_MINUTES", "330"))
+SUGGEST_MAX_LIMIT = int(os.getenv("SUGGEST_MAX_LIMIT", "20"))
+
 # Application
 APP_NAME = "Success Map - Career Guidance"
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "1"))
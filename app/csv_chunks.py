@@ -0,0 +1,76 @@
+"""
+Splitting a CSV file into byte ranges that can be parsed independently
+
+Each range starts at the beginning of a record, so a worker can parse its
+range with the header prepended and get exactly the rows a single parse
+of the whole file would give for that stretch.
+"""
+import mmap
+import os
+from typing import List, Tuple
+
+# Bytes scanned at a time while looking for a record boundary
+_SCAN_BLOCK = 1 << 16
+
+
+def _record_end(data, pos: int, quotes: int) -> Tuple[int, int]:
+    """
+    Return the offset just past the first newline at or after pos that
+    ends a record, and the running quote count there.
+
+    quotes is the number of '"' bytes before pos. A newline only ends a
+    record when that count is even; inside a quoted field it is part of
+    the value. Escaped quotes ("") leave the parity unchanged.
+    """
+    size = len(data)
+    while pos < size:
+        newline = data.find(b"\n", pos)
+        if newline == -1:
+            return size, quotes
+        quotes += data[pos:newline].count(b'"')
+        pos = newline + 1
+        if quotes % 2 == 0:
+            return pos, quotes
+    return size, quotes
+
+
+def split_csv(path: str, parts: int, min_bytes: int = 0) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Split a CSV into at most parts byte ranges, each ending on a record
+    boundary and holding at least min_bytes where the file allows.
+
+    Returns:
+        The header line and the (start, end) offset of each range
+    """
+    if os.path.getsize(path) == 0:
+        return b"", []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header_end, quotes = _record_end(data, 0, 0)
+        header = data[:header_end]
+        size = len(data)
+        parts = max(1, min(parts, (size - header_end) // max(min_bytes, 1)))
+
+        bounds = [header_end]
+        pos = header_end
+        for part in range(1, parts):
+            target = header_end + (size - header_end) * part // parts
+            if target <= pos:
+                continue
+            # Count the quotes up to the target in blocks, without copying the file at once
+            while pos < target:
+                end = min(pos + _SCAN_BLOCK, target)
+                quotes += data[pos:end].count(b'"')
+                pos = end
+            pos, quotes = _record_end(data, pos, quotes)
+            if pos >= size:
+                break
+            bounds.append(pos)
+        bounds.append(size)
+    return header, [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def read_range(path: str, start: int, end: int) -> bytes:
+    """Read bytes [start, end) of a file"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
@@ -0,0 +1,264 @@
+"""
+On-disk snapshot cache for the normalized restaurant dataset
+
+Parsing and normalizing the Zomato CSV takes seconds, so the normalized
+table is written once to a columnar binary snapshot and reused by every
+later cold-start for as long as the source CSV is unchanged. Snapshot
+columns, and the indexes stored alongside them, are memory-mapped
+read-only, so all workers on a host share one copy of the data through the
+page cache.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+import numpy as np
+
+from .config import DATASET_SNAPSHOT_DIR
+from .restaurant_table import CategoryColumn, Column, RestaurantTable, StringColumn
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the normalized table layout changes
+SNAPSHOT_FORMAT = 11
+
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_PREFIX = "snapshot-"
+LOCK_FILE = ".build.lock"
+# Subdirectory of a snapshot holding the stored indexes
+INDEX_DIR = "indexes"
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path: str) -> Dict[str, Any]:
+    """Return the cheap (path, size, mtime) fingerprint of a source file"""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def _read_manifest(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    """Read the snapshot manifest, returning None if missing or corrupt"""
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable snapshot manifest {manifest_path}: {e}")
+        return None
+
+
+def _write_manifest(snapshot_dir: str, manifest: Dict[str, Any]) -> None:
+    """Atomically replace the snapshot manifest"""
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(snapshot_dir, MANIFEST_FILE))
+
+
+def snapshot_matches(csv_path: str, snapshot_dir: str = DATASET_SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Return the manifest if the snapshot on disk was built from the given CSV.
+
+    The size/mtime fingerprint is checked first; only when it differs is the
+    file hashed, so touching or copying an unchanged CSV does not force a
+    rebuild.
+    """
+    manifest = _read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        logger.info("Dataset snapshot was written in a different format")
+        return None
+    if not os.path.isdir(os.path.join(snapshot_dir, manifest.get("snapshot", ""))):
+        return None
+
+    fingerprint = source_fingerprint(csv_path)
+    if manifest.get("source") == fingerprint:
+        return manifest
+
+    logger.info("Dataset source fingerprint changed, verifying content hash")
+    if manifest.get("digest") != file_digest(csv_path):
+        return None
+
+    # Same content under a new path or mtime: remember the new fingerprint
+    manifest["source"] = fingerprint
+    try:
+        _write_manifest(snapshot_dir, manifest)
+    except OSError as e:
+        logger.warning(f"Could not refresh snapshot manifest: {e}")
+    return manifest
+
+
+def _map_bytes(path: str):
+    """Memory-map a file read-only (empty files map to b'')"""
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _open_columns(path: str, kinds: Dict[str, str]) -> Dict[str, Column]:
+    """Map the columns written by _write_columns in the directory path"""
+    def strings(prefix: str) -> StringColumn:
+        return StringColumn(
+            _map_bytes(os.path.join(path, f"{prefix}.bytes")),
+            np.load(os.path.join(path, f"{prefix}.offsets.npy"), mmap_mode="r"),
+        )
+
+    columns = {}
+    for name, kind in kinds.items():
+        if kind == "string":
+            columns[name] = strings(name)
+        elif kind == "category":
+            columns[name] = CategoryColumn(
+                np.load(os.path.join(path, f"{name}.codes.npy"), mmap_mode="r"),
+                strings(f"{name}.categories"),
+            )
+        else:
+            columns[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    return columns
+
+
+def _write_columns(path: str, columns: Dict[str, Column]) -> Dict[str, str]:
+    """Write every column into the directory path, returning the kind of each"""
+    def write_strings(prefix: str, col: StringColumn) -> None:
+        with open(os.path.join(path, f"{prefix}.bytes"), "wb") as f:
+            f.write(col.buffer)
+        np.save(os.path.join(path, f"{prefix}.offsets.npy"), col.offsets)
+
+    os.makedirs(path, exist_ok=True)
+    kinds = {}
+    for name, col in columns.items():
+        if isinstance(col, StringColumn):
+            write_strings(name, col)
+            kinds[name] = "string"
+        elif isinstance(col, CategoryColumn):
+            np.save(os.path.join(path, f"{name}.codes.npy"), col.codes)
+            write_strings(f"{name}.categories", col.categories)
+            kinds[name] = "category"
+        else:
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(col))
+            kinds[name] = str(col.dtype)
+    return kinds
+
+
+@contextmanager
+def build_lock(snapshot_dir: str = DATASET_SNAPSHOT_DIR) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the snapshot directory across processes.
+
+    Workers take it before building, so when several find the snapshot
+    missing one builds it and the others map the result. Without fcntl the
+    lock is a no-op and concurrent builds are only made safe by
+    save_snapshot.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, LOCK_FILE), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def load_snapshot(csv_path: str, snapshot_dir: str = DATASET_SNAPSHOT_DIR
+                  ) -> Optional[Tuple[RestaurantTable, Dict[str, Column]]]:
+    """
+    Map the normalized table for csv_path and the indexes stored with it,
+    or return None if there is no valid snapshot.
+    """
+    manifest = snapshot_matches(csv_path, snapshot_dir)
+    if manifest is None:
+        return None
+    path = os.path.join(snapshot_dir, manifest["snapshot"])
+    try:
+        table = RestaurantTable(_open_columns(path, manifest["columns"]), version=manifest["digest"][:16])
+        indexes = _open_columns(os.path.join(path, INDEX_DIR), manifest["indexes"])
+    except Exception as e:
+        logger.warning(f"Could not read dataset snapshot: {e}")
+        return None
+    logger.info(f"Mapped {len(table)} rows and {len(indexes)} index arrays from dataset snapshot {manifest['snapshot']}")
+    return table, indexes
+
+
+def save_snapshot(csv_path: str, table: RestaurantTable, indexes: Dict[str, Column],
+                  snapshot_dir: str = DATASET_SNAPSHOT_DIR) -> str:
+    """
+    Write the normalized table and the indexes built from it as the
+    snapshot for csv_path.
+
+    Columns are written into a temporary directory which is renamed into
+    place before the manifest is switched over, so concurrent workers never
+    observe a half-written snapshot.
+
+    Returns:
+        The content digest of the source CSV
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fingerprint = source_fingerprint(csv_path)
+    digest = file_digest(csv_path)
+    # The format is part of the name so an older layout of the same CSV is never reused
+    name = f"{SNAPSHOT_PREFIX}{digest[:16]}-{SNAPSHOT_FORMAT}"
+    final_path = os.path.join(snapshot_dir, name)
+
+    tmp_path = tempfile.mkdtemp(dir=snapshot_dir, prefix=".building-")
+    try:
+        kinds = _write_columns(tmp_path, {name: table[name] for name in table.columns})
+        index_kinds = _write_columns(os.path.join(tmp_path, INDEX_DIR), indexes)
+        try:
+            os.replace(tmp_path, final_path)
+        except OSError:
+            # Another worker renamed the same snapshot into place first
+            if not os.path.isdir(final_path):
+                raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    _write_manifest(snapshot_dir, {
+        "format": SNAPSHOT_FORMAT,
+        "source": fingerprint,
+        "digest": digest,
+        "snapshot": name,
+        "rows": len(table),
+        "columns": kinds,
+        "indexes": index_kinds,
+        "created_at": datetime.utcnow().isoformat(),
+    })
+    logger.info(f"Wrote dataset snapshot for {csv_path} ({len(table)} rows) to {final_path}")
+
+    # Unmapping is up to the processes still using old snapshots; removing
+    # the files only drops their directory entries on POSIX systems.
+    for entry in os.listdir(snapshot_dir):
+        if entry.startswith(SNAPSHOT_PREFIX) and entry != name:
+            shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+
+    return digest
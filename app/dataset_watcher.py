@@ -0,0 +1,198 @@
+"""
+Background reloading of the restaurant dataset
+
+A daemon thread polls the dataset CSV's size and modification time and
+rebuilds the dataset off the request path once a change has settled, or
+straight away when an admin asks for it; see reload_dataset.
+
+An admin request reaches a single worker, so it is also written as a
+marker file in the snapshot directory. Every worker's watcher polls the
+marker and reloads when it sees a request it has not handled yet.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from .config import DATASET_RELOAD_INTERVAL, DATASET_RELOAD_REQUEST_POLL, DATASET_SNAPSHOT_DIR
+from .dataset_cache import source_fingerprint
+from .restaurant_service import locate_dataset, reload_dataset
+
+logger = logging.getLogger(__name__)
+
+REQUEST_FILE = "reload-request.json"
+
+
+def _read_request(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    """The last reload request written to the snapshot directory, if any"""
+    try:
+        with open(os.path.join(snapshot_dir, REQUEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable reload request: {e}")
+        return None
+
+
+def _write_request(snapshot_dir: str, request: Dict[str, Any]) -> None:
+    """Atomically replace the reload request"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(request, f)
+    os.replace(tmp_path, os.path.join(snapshot_dir, REQUEST_FILE))
+
+
+class DatasetWatcher:
+    """
+    Thread reloading the dataset when its CSV changes or on request.
+
+    A changed fingerprint must stay the same for one more interval before
+    the reload starts, so a CSV still being copied is not loaded half
+    written. Requests made through other workers are picked up within
+    request_poll seconds, even when interval is 0.
+    """
+
+    def __init__(self, interval: float, request_poll: float = DATASET_RELOAD_REQUEST_POLL,
+                 snapshot_dir: str = DATASET_SNAPSHOT_DIR):
+        self.interval = interval
+        self.request_poll = request_poll
+        self.snapshot_dir = snapshot_dir
+        self._wake = threading.Event()
+        self._stopping = False
+        self._forced = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[Dict[str, Any]] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._request_id: Optional[str] = None
+        self._next_check = 0.0
+        self.checks = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        """Remember the current CSV fingerprint and reload request, and start watching"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._fingerprint = self._current_fingerprint()
+            # Requests made before this worker started are already in the data it loaded
+            request = _read_request(self.snapshot_dir)
+            self._request_id = request.get("id") if request else None
+            self._next_check = time.monotonic() + self.interval
+            self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+            self._thread.start()
+        if self.interval > 0:
+            logger.info(f"Watching the dataset for changes every {self.interval}s")
+        else:
+            logger.info("Watching for dataset reload requests only")
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+
+    def trigger(self, force: bool = False) -> None:
+        """Ask every worker for a reload now; force rebuilds even an unchanged CSV"""
+        self.start()
+        request = {"id": uuid.uuid4().hex, "force": force, "at": time.time()}
+        try:
+            _write_request(self.snapshot_dir, request)
+        except OSError as e:
+            logger.warning(f"Could not share the reload request with other workers: {e}")
+        with self._lock:
+            self._request_id = request["id"]
+            self._forced = self._forced or force
+        self._wake.set()
+
+    def _current_fingerprint(self) -> Optional[Dict[str, Any]]:
+        # Polled every interval, so the lookup stays out of the logs
+        path = locate_dataset()
+        try:
+            return source_fingerprint(path) if path else None
+        except OSError:
+            return None
+
+    def _requested(self) -> bool:
+        """Whether another worker wrote a reload request not handled yet"""
+        request = _read_request(self.snapshot_dir)
+        if not request or not request.get("id"):
+            return False
+        with self._lock:
+            if request["id"] == self._request_id:
+                return False
+            self._request_id = request["id"]
+            self._forced = self._forced or bool(request.get("force"))
+        logger.info("Reload requested through another worker")
+        return True
+
+    def _changed(self) -> bool:
+        """Whether the CSV changed and has stayed unchanged for one interval"""
+        fingerprint = self._current_fingerprint()
+        self.checks += 1
+        if fingerprint is None or fingerprint == self._fingerprint:
+            self._pending = None
+            return False
+        if fingerprint != self._pending:
+            logger.info("Dataset file changed, reloading once it settles")
+            self._pending = fingerprint
+            return False
+        return True
+
+    def _csv_due(self) -> bool:
+        """Whether the interval since the last CSV check has passed"""
+        if self.interval <= 0 or time.monotonic() < self._next_check:
+            return False
+        self._next_check = time.monotonic() + self.interval
+        return True
+
+    def _run(self) -> None:
+        while not self._stopping:
+            timeouts = [t for t in (self.interval, self.request_poll) if t > 0]
+            requested = self._wake.wait(min(timeouts) if timeouts else None)
+            self._wake.clear()
+            if self._stopping:
+                break
+            requested = requested or self._requested()
+            with self._lock:
+                force, self._forced = self._forced, False
+            if not requested and not (self._csv_due() and self._changed()):
+                continue
+            self._reload(force)
+
+    def _reload(self, force: bool) -> None:
+        fingerprint = self._current_fingerprint()
+        started = time.time()
+        try:
+            outcome = reload_dataset(force=force)
+        except Exception as e:
+            logger.error(f"Error reloading dataset: {str(e)}", exc_info=True)
+            outcome = {"status": "failed"}
+        with self._lock:
+            self._fingerprint, self._pending = fingerprint, None
+            if outcome["status"] == "reloaded":
+                self.reloads += 1
+            elif outcome["status"] == "failed":
+                self.failures += 1
+            self.last_reload = {**outcome, "at": started, "seconds": round(time.time() - started, 3)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters describing reload activity"""
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "request_poll": self.request_poll,
+                "checks": self.checks,
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_reload": self.last_reload,
+            }
+
+
+dataset_watcher = DatasetWatcher(DATASET_RELOAD_INTERVAL)
@@ -0,0 +1,89 @@
+"""
+City, locality and dish facets for the restaurant finder dropdowns
+"""
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .location_index import LocationIndex, normalize_place
+from .restaurant_table import RestaurantTable
+
+# Sub-location option meaning "the whole city"
+ALL_AREAS = "All Areas"
+
+
+def split_cuisines(cuisines: str) -> FrozenSet[str]:
+    """Split a comma separated cuisines value into lower-cased dishes"""
+    return frozenset(dish.strip().lower() for dish in cuisines.split(","))
+
+
+class Facets:
+    """
+    Facet lists computed once per dataset.
+
+    Cities and localities keep the spelling used in the dataset; lookups
+    are by normalized name.
+    """
+
+    def __init__(
+        self,
+        cities: List[str],
+        sublocations: Dict[str, List[str]],
+        dishes: Dict[Tuple[str, str], List[str]],
+    ):
+        self.cities = cities
+        self._sublocations = sublocations
+        # Keyed by (city, locality); "" stands for all cities / all localities
+        self._dishes = dishes
+
+    @classmethod
+    def build(cls, table: RestaurantTable, location_index: LocationIndex) -> "Facets":
+        """Compute the facets from the table, grouped by the location index"""
+        locations, localities, cuisines = table["location"], table["locality"], table["cuisines"]
+
+        # Many rows share a cuisines value, so each distinct value is split once
+        parsed: Dict[str, FrozenSet[str]] = {}
+
+        def dishes_of(rows) -> set:
+            dishes = set()
+            for value in {cuisines[row] for row in rows}:
+                if value not in parsed:
+                    parsed[value] = split_cuisines(value)
+                dishes |= parsed[value]
+            return dishes
+
+        cities, sublocations, dishes = [], {}, {}
+        everything = set()
+        for city_key, city_rows in location_index.cities.items():
+            city = locations[city_rows[0]].split(",")[0].strip()
+            if city:
+                cities.append(city)
+
+            names, city_dishes, covered = set(), set(), 0
+            for locality_key, rows in location_index.localities[city_key].items():
+                locality_dishes = dishes_of(rows)
+                dishes[(city_key, locality_key)] = sorted(locality_dishes)
+                city_dishes |= locality_dishes
+                covered += len(rows)
+                if locality_key != city_key:
+                    names.add(localities[rows[0]].strip())
+            if covered < len(city_rows):
+                # Some rows have no locality and only count towards the city
+                city_dishes |= dishes_of(city_rows)
+
+            sublocations[city_key] = [ALL_AREAS] + sorted(names, key=lambda x: x.lower())
+            dishes[(city_key, "")] = sorted(city_dishes)
+            everything |= city_dishes
+
+        dishes[("", "")] = sorted(everything)
+        return cls(sorted(set(cities)), sublocations, dishes)
+
+    def sublocations_for(self, city: str) -> List[str]:
+        """Localities of a city, preceded by the "All Areas" option"""
+        return self._sublocations.get(normalize_place(city), [ALL_AREAS])
+
+    def dishes_for(self, city: Optional[str] = None, sublocation: Optional[str] = None) -> List[str]:
+        """Dishes served in a city, or in one of its localities"""
+        city_key = normalize_place(city) if city else ""
+        locality_key = normalize_place(sublocation) if city and sublocation else ""
+        if locality_key == normalize_place(ALL_AREAS):
+            locality_key = ""
+        return self._dishes.get((city_key, locality_key), [])
@@ -0,0 +1,111 @@
+"""
+Character-trigram index for spelling correction
+"""
+from typing import Dict, List, Set
+
+import numpy as np
+
+# Candidates verified by edit distance per lookup, best trigram overlap first
+_MAX_VERIFIED = 32
+
+
+def trigrams(term: str) -> Set[str]:
+    """Character trigrams of term, padded so a term of n characters has n of them"""
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance between a and b (insertions,
+    deletions, substitutions and adjacent transpositions), or limit + 1 as
+    soon as it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """
+    Maps trigrams to the vocabulary terms containing them.
+
+    A term within k edits of the query shares all but at most 3k of the
+    query's trigrams, so candidates are the terms sharing enough trigrams
+    and of a close enough length; only those are checked by edit distance.
+    Postings are stored in CSR layout like TokenIndex.
+    """
+
+    def __init__(self, terms: List[str], weights: np.ndarray, grams: Dict[str, int],
+                 starts: np.ndarray, term_ids: np.ndarray):
+        self.terms = terms
+        self.weights = weights
+        self.lengths = np.array([len(term) for term in terms], dtype=np.int32)
+        self._grams = grams
+        self._starts = starts
+        self._term_ids = term_ids
+
+    @classmethod
+    def build(cls, weighted_terms: Dict[str, int]) -> "TrigramIndex":
+        """Index terms, each weighted by how many rows it matches"""
+        terms = sorted(term for term in weighted_terms if term)
+        grams: Dict[str, int] = {}
+        gram_ids, term_ids = [], []
+        for term_id, term in enumerate(terms):
+            for gram in trigrams(term):
+                gram_ids.append(grams.setdefault(gram, len(grams)))
+                term_ids.append(term_id)
+
+        ids = np.array(gram_ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        starts = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=len(grams)), out=starts[1:])
+        weights = np.array([weighted_terms[term] for term in terms], dtype=np.int64)
+        return cls(terms, weights, grams, starts, np.array(term_ids, dtype=np.int32)[order])
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def lookup(self, term: str, limit: int = 5, max_edits: int = 0) -> List[str]:
+        """
+        Return up to limit vocabulary terms within max_edits of term,
+        closest first and then most common first.
+
+        max_edits defaults to 1 for terms of up to four characters and 2
+        for longer ones.
+        """
+        max_edits = max_edits or (1 if len(term) <= 4 else 2)
+        query = trigrams(term)
+        slices = [
+            self._term_ids[self._starts[gram]:self._starts[gram + 1]]
+            for gram in (self._grams.get(g) for g in query)
+            if gram is not None
+        ]
+        if not slices:
+            return []
+
+        ids, shared = np.unique(np.concatenate(slices), return_counts=True)
+        keep = (shared >= max(1, len(query) - 3 * max_edits)) & (
+            np.abs(self.lengths[ids] - len(term)) <= max_edits
+        )
+        ids, shared = ids[keep], shared[keep]
+        ids = ids[np.argsort(-shared, kind="stable")[:_MAX_VERIFIED]]
+
+        found = []
+        for term_id in ids.tolist():
+            distance = edit_distance(term, self.terms[term_id], max_edits)
+            if distance <= max_edits:
+                found.append((distance, -int(self.weights[term_id]), self.terms[term_id]))
+        found.sort()
+        return [candidate for _, _, candidate in found[:limit]]
@@ -0,0 +1,88 @@
+"""
+Grid index over restaurant coordinates for radius searches
+"""
+import math
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Cells are this many degrees on a side (about 1.1 km of latitude)
+CELL_DEGREES = 0.01
+
+# Cell keys pack the latitude cell above the longitude cell
+_LON_CELLS = 2 ** 16
+_CELL_OFFSET = 2 ** 15
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from (lat, lon) to every point of the arrays"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _cell(degrees):
+    return np.floor(np.asarray(degrees) / CELL_DEGREES).astype(np.int64) + _CELL_OFFSET
+
+
+class GeoIndex:
+    """
+    Rows bucketed into a grid of CELL_DEGREES cells.
+
+    Rows are sorted by cell key, latitude cell first, so the cells of one
+    latitude band across a longitude range are a single contiguous slice.
+    A radius query reads one slice per band of its bounding box and only
+    measures the distance to the rows in those slices.
+    """
+
+    def __init__(self, keys: np.ndarray, rows: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray):
+        self.keys = keys
+        self.rows = rows
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+
+    @classmethod
+    def build(cls, latitudes: np.ndarray, longitudes: np.ndarray) -> "GeoIndex":
+        """Index every row with valid coordinates; missing ones are NaN or (0, 0)"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = (
+            np.isfinite(latitudes) & np.isfinite(longitudes)
+            & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180)
+            & ((latitudes != 0) | (longitudes != 0))
+        )
+        rows = np.flatnonzero(valid).astype(np.int32)
+        keys = _cell(latitudes[rows]) * _LON_CELLS + _cell(longitudes[rows])
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], rows[order], latitudes[rows][order], longitudes[rows][order])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the sorted rows within radius_km of (lat, lon) and their
+        distances in km, aligned with the rows.
+        """
+        lat_span = radius_km / KM_PER_DEGREE
+        lon_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(min(abs(lat) + lat_span, 90.0))), 1e-6))
+        lat_lo, lat_hi = _cell(max(lat - lat_span, -90.0)), _cell(min(lat + lat_span, 90.0))
+        lon_lo, lon_hi = _cell(max(lon - lon_span, -180.0)), _cell(min(lon + lon_span, 180.0))
+
+        bands = np.arange(lat_lo, lat_hi + 1, dtype=np.int64) * _LON_CELLS
+        starts = np.searchsorted(self.keys, bands + lon_lo, side="left")
+        ends = np.searchsorted(self.keys, bands + lon_hi, side="right")
+        slices = [np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if start < end]
+        if not slices:
+            return self.rows[:0], np.zeros(0)
+
+        positions = np.concatenate(slices)
+        distances = haversine_km(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        near = distances <= radius_km
+        rows, distances = self.rows[positions[near]], distances[near]
+        order = np.argsort(rows)
+        return rows[order], distances[order]
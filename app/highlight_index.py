@@ -0,0 +1,119 @@
+"""
+Bitmap index over restaurant highlights ("Outdoor Seating", "Wifi", ...)
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Quoted entries of a highlights value such as "['Lunch', \"Women's Only\"]"
+_ENTRY_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+
+# Set bits of every byte value, where np.bitwise_count (NumPy 2) is missing
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int32)
+
+
+def _popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Set bits in each row of a 2-D uint64 array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def parse_highlights(value: str) -> List[str]:
+    """Split a highlights value into its tags"""
+    tags = ((single or double).strip() for single, double in _ENTRY_RE.findall(value))
+    return [tag for tag in tags if tag]
+
+
+def tag_key(tag: str) -> str:
+    """Lower-case a tag and collapse its whitespace"""
+    return " ".join(tag.lower().split())
+
+
+def normalize_tags(tags: Iterable[str]) -> Tuple[str, ...]:
+    """Sorted distinct tag keys, for filtering and caching"""
+    return tuple(sorted({tag_key(tag) for tag in tags} - {""}))
+
+
+class HighlightIndex:
+    """
+    One bitmap per highlight tag, bit r set when row r has the tag.
+
+    Bitmaps are packed eight rows to a byte, padded to whole 64-bit words,
+    and stacked into one matrix, so required and excluded tags combine with
+    whole-array AND / AND NOT, and tag counts over a set of rows are
+    popcounts of AND-ed bitmaps.
+    """
+
+    def __init__(self, labels: List[str], bitmaps: np.ndarray, size: int):
+        self.labels = labels
+        self.bitmaps = bitmaps
+        self.size = size
+        self._positions = {tag_key(label): i for i, label in enumerate(labels)}
+
+    @classmethod
+    def build(cls, values: Iterable[str], size: int) -> "HighlightIndex":
+        """Parse every row's highlights value, each distinct value once"""
+        parsed: Dict[str, List[str]] = {}
+        positions: Dict[str, int] = {}
+        # Each tag is displayed with the first spelling seen
+        labels: List[str] = []
+        tag_ids, tag_rows = [], []
+        for row, value in enumerate(values):
+            if value not in parsed:
+                parsed[value] = parse_highlights(value)
+            for tag in parsed[value]:
+                key = tag_key(tag)
+                if key not in positions:
+                    positions[key] = len(labels)
+                    labels.append(tag)
+                tag_ids.append(positions[key])
+                tag_rows.append(row)
+
+        flags = np.zeros((len(labels), -(-size // 64) * 64), dtype=bool)
+        flags[np.array(tag_ids, dtype=np.int64), np.array(tag_rows, dtype=np.int64)] = True
+        return cls(labels, np.packbits(flags, axis=1), size)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def mask(self, required: Sequence[str] = (), excluded: Sequence[str] = ()) -> Optional[np.ndarray]:
+        """
+        Bitmap of the rows having every required tag and none of the
+        excluded ones, or None when no tag is given. Unknown required tags
+        match no rows; unknown excluded tags are ignored.
+        """
+        if not required and not excluded:
+            return None
+        mask = np.full(self.bitmaps.shape[1], 0xFF, dtype=np.uint8)
+        for tag in required:
+            position = self._positions.get(tag_key(tag))
+            if position is None:
+                return np.zeros_like(mask)
+            mask &= self.bitmaps[position]
+        for tag in excluded:
+            position = self._positions.get(tag_key(tag))
+            if position is not None:
+                mask &= ~self.bitmaps[position]
+        return mask
+
+    def filter(self, rows: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Keep the rows whose bit is set in mask"""
+        return rows[(mask[rows >> 3] >> (7 - (rows & 7))) & 1 == 1]
+
+    def counts(self, rows: np.ndarray) -> Dict[str, int]:
+        """Number of the rows having each tag, most common first, for tags any row has"""
+        if len(self) == 0 or len(rows) == 0:
+            return {}
+        if len(rows) * 8 < self.bitmaps.shape[1]:
+            # Few rows: read their bits directly
+            bits = (self.bitmaps[:, rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1
+            totals = bits.sum(axis=1)
+        else:
+            flags = np.zeros(self.bitmaps.shape[1] * 8, dtype=bool)
+            flags[rows] = True
+            selected = np.packbits(flags).view(np.uint64)
+            totals = _popcount_rows(self.bitmaps.view(np.uint64) & selected)
+        order = np.argsort(-totals, kind="stable")
+        return {self.labels[i]: int(totals[i]) for i in order.tolist() if totals[i]}
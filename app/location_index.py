@@ -0,0 +1,195 @@
+"""
+Hierarchical city -> locality index for location queries
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .restaurant_table import Column, StringColumn, TextColumn
+from .text_index import TokenIndex, rows_by_code
+
+
+def normalize_place(text: str) -> str:
+    """Lower-case a place name and collapse its whitespace"""
+    return " ".join(text.lower().split())
+
+
+def _key_codes(column: TextColumn, key: Callable[[str], str]) -> Tuple[np.ndarray, List[str]]:
+    """Code every row by key(value), computing the key once per distinct value"""
+    codes, values = column.factorize()
+    key_codes, keys = pd.factorize(np.array([key(value) for value in values], dtype=object))
+    return key_codes[codes], [str(k) for k in keys]
+
+
+def _grouped(names: List[str], codes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Map every name to the sorted rows coded with its position, in name order"""
+    starts, rows = rows_by_code(codes, len(names))
+    order = sorted(range(len(names)), key=names.__getitem__)
+    return {names[i]: rows[starts[i]:starts[i + 1]] for i in order}
+
+
+def _pack(groups: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack row arrays into starts and rows in CSR layout"""
+    starts = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum([len(rows) for rows in groups], out=starts[1:])
+    rows = np.concatenate(groups) if groups else np.zeros(0, dtype=np.int32)
+    return starts, rows.astype(np.int32, copy=False)
+
+
+def _union_disjoint(arrays: List[np.ndarray]) -> np.ndarray:
+    """Union of sorted row arrays that share no rows"""
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.sort(np.concatenate(arrays))
+
+
+class LocationIndex:
+    """
+    Row-id sets per city and per locality within each city, plus a token
+    index over the full location text (city, locality and address).
+
+    A location query is a list of terms such as ["bangalore", "koramangala"].
+    Each term resolves by dictionary lookup to a city, to the localities of
+    the city named so far, or, failing both, to an address token match; the
+    query's rows are the intersection of its terms' rows.
+    """
+
+    def __init__(
+        self,
+        cities: Dict[str, np.ndarray],
+        localities: Dict[str, Dict[str, np.ndarray]],
+        address_index: TokenIndex,
+    ):
+        self.cities = cities
+        self.localities = localities
+        self.address_index = address_index
+
+        # Localities across all cities, for queries that name no city
+        merged = {}
+        for city_localities in localities.values():
+            for key, rows in city_localities.items():
+                merged.setdefault(key, []).append(rows)
+        self.all_localities = {key: _union_disjoint(parts) for key, parts in merged.items()}
+
+        self._locality_keys = {city: sorted(locs) for city, locs in localities.items()}
+        self._all_locality_keys = sorted(self.all_localities)
+
+    @classmethod
+    def build(cls, locations: TextColumn, localities: TextColumn, addresses: TextColumn) -> "LocationIndex":
+        """
+        Build the index from the combined "City, Locality" column plus
+        locality and address, normalizing each distinct value once.
+        """
+        city_codes, city_keys = _key_codes(locations, lambda value: normalize_place(value.split(",", 1)[0]))
+        locality_codes, locality_keys = _key_codes(localities, normalize_place)
+        cities = _grouped(city_keys, city_codes)
+
+        # One group per (city, locality) pair present in the table
+        width = len(locality_keys)
+        pairs, pair_codes = np.unique(city_codes.astype(np.int64) * width + locality_codes, return_inverse=True)
+        pairs = pairs.tolist()
+        starts, rows = rows_by_code(pair_codes.reshape(-1), len(pairs))
+        by_city: Dict[str, Dict[str, np.ndarray]] = {city: {} for city in cities}
+        for i in sorted(range(len(pairs)), key=lambda i: locality_keys[pairs[i] % width]):
+            city, locality = city_keys[pairs[i] // width], locality_keys[pairs[i] % width]
+            if locality:
+                by_city[city][locality] = rows[starts[i]:starts[i + 1]]
+        return cls(cities, by_city, TokenIndex.build([locations, localities, addresses]))
+
+    def to_columns(self, name: str) -> Dict[str, Column]:
+        """The index as columns named "<name>.<part>", for the dataset snapshot"""
+        city_keys = list(self.cities)
+        city_starts, city_rows = _pack(list(self.cities.values()))
+        positions = {city: i for i, city in enumerate(city_keys)}
+        locality_cities, locality_keys, locality_groups = [], [], []
+        for city, city_localities in self.localities.items():
+            for key, rows in city_localities.items():
+                locality_cities.append(positions[city])
+                locality_keys.append(key)
+                locality_groups.append(rows)
+        locality_starts, locality_rows = _pack(locality_groups)
+        return {
+            f"{name}.cities": StringColumn.from_values(city_keys),
+            f"{name}.city_starts": city_starts,
+            f"{name}.city_rows": city_rows,
+            f"{name}.localities": StringColumn.from_values(locality_keys),
+            f"{name}.locality_cities": np.array(locality_cities, dtype=np.int32),
+            f"{name}.locality_starts": locality_starts,
+            f"{name}.locality_rows": locality_rows,
+            **self.address_index.to_columns(f"{name}.address"),
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Column], name: str) -> "LocationIndex":
+        """Open an index stored by to_columns; its row arrays stay memory-mapped"""
+        city_keys = list(columns[f"{name}.cities"])
+        starts, rows = columns[f"{name}.city_starts"], columns[f"{name}.city_rows"]
+        cities = {city: rows[starts[i]:starts[i + 1]] for i, city in enumerate(city_keys)}
+
+        localities: Dict[str, Dict[str, np.ndarray]] = {city: {} for city in city_keys}
+        starts, rows = columns[f"{name}.locality_starts"], columns[f"{name}.locality_rows"]
+        owners = columns[f"{name}.locality_cities"].tolist()
+        for i, key in enumerate(columns[f"{name}.localities"]):
+            localities[city_keys[owners[i]]][key] = rows[starts[i]:starts[i + 1]]
+        return cls(cities, localities, TokenIndex.from_columns(columns, f"{name}.address"))
+
+    def _localities_matching(self, term: str, city: Optional[str]) -> List[np.ndarray]:
+        """Rows of the localities named term, or starting with the word term"""
+        if city is not None:
+            keys, rows = self._locality_keys.get(city, []), self.localities.get(city, {})
+        else:
+            keys, rows = self._all_locality_keys, self.all_localities
+        matches = []
+        pos = bisect_left(keys, term)
+        while pos < len(keys) and keys[pos].startswith(term):
+            key = keys[pos]
+            if len(key) == len(term) or key[len(term)] == " ":
+                matches.append(rows[key])
+            pos += 1
+        return matches
+
+    def resolve_term(self, term: str, city: Optional[str] = None) -> Tuple[np.ndarray, str]:
+        """
+        Resolve one location term, looking up localities within city if given.
+
+        Returns:
+            The sorted matching rows, and whether the term matched a
+            "city", a "locality" or the "address" tokens
+        """
+        term = normalize_place(term)
+        if city is None and term in self.cities:
+            return self.cities[term], "city"
+        matches = self._localities_matching(term, city)
+        if matches:
+            # Every row has one locality, so these row sets are disjoint
+            return _union_disjoint(matches), "locality"
+        return self.address_index.match(term), "address"
+
+    def resolve_scopes(self, terms: List[str]) -> List[np.ndarray]:
+        """
+        Resolve the terms one at a time.
+
+        Returns:
+            The sorted rows matching the first 1, 2, ... n terms, so each
+            scope is a subset of the one before it
+        """
+        scopes: List[np.ndarray] = []
+        rows, city = None, None
+        for term in terms:
+            if rows is not None and len(rows) == 0:
+                scopes.append(rows)
+                continue
+            term_rows, kind = self.resolve_term(term, city)
+            if rows is None:
+                rows = term_rows
+            elif kind == "locality" and city is not None and rows is self.cities[city]:
+                # Localities of the city named so far are a subset of its rows
+                rows = term_rows
+            else:
+                rows = np.intersect1d(rows, term_rows, assume_unique=True)
+            if kind == "city":
+                city = normalize_place(term)
+            scopes.append(rows)
+        return scopes
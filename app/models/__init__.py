@@ -2,5 +2,6 @@
 Data models
 """
 from .user import User, UserInDB, UserCreate, Token, TokenData
+from .search import SearchQuery, BatchSearchRequest
 
-__all__ = ["User", "UserInDB", "UserCreate", "Token", "TokenData"]
+__all__ = ["User", "UserInDB", "UserCreate", "Token", "TokenData", "SearchQuery", "BatchSearchRequest"]
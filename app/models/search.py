@@ -0,0 +1,30 @@
+"""
+Search request models
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from ..config import SEARCH_PAGE_MAX_SIZE
+
+
+class SearchQuery(BaseModel):
+    dish: str
+    location: str
+    top_n: int = Field(10, ge=1, le=SEARCH_PAGE_MAX_SIZE)
+    rank_by: str = "rating"
+    target_cost: Optional[int] = None
+    relax: bool = False
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    min_cost: Optional[int] = None
+    max_cost: Optional[int] = None
+    min_votes: Optional[int] = None
+    max_votes: Optional[int] = None
+    require: List[str] = []
+    exclude: List[str] = []
+    open_at: Optional[str] = None
+    open_now: bool = False
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery]
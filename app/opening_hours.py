@@ -0,0 +1,205 @@
+"""
+Opening hours parsed from the free-text timings column
+
+Timings look like "12 Noon to 3:30 PM, 7 PM to 11 PM (Mon-Sun)" or
+"Closed (Mon), 11am – 11pm (Tue-Sun)". They are parsed once at load into
+intervals of minutes of the week, Monday 00:00 being minute 0.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Row status
+PARSED, MISSING, UNPARSEABLE = 0, 1, 2
+
+_MISSING_VALUES = {"", "not available", "nan"}
+
+# "<times> (<days>)" groups; times without a group apply to every day
+_GROUP_RE = re.compile(r"([^()]*)\(([^)]*)\)")
+_RANGE_SPLIT_RE = re.compile(r"\s+to\s+|\s*[–—-]\s*")
+_TIME_RE = re.compile(r"^(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm|noon|midnight)?$")
+
+Interval = Tuple[int, int]
+
+
+def parse_time(text: str) -> Optional[int]:
+    """Minutes after midnight of a time such as "7 PM", "11:30am" or "12 Noon" """
+    text = text.strip()
+    if text in ("noon", "midnight"):
+        text = "12 " + text
+    match = _TIME_RE.match(text)
+    if not match:
+        return None
+    hour, minute, suffix = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if minute >= 60:
+        return None
+    if suffix is None:
+        return hour * 60 + minute if hour <= 24 else None
+    if not 1 <= hour <= 12 or (suffix in ("noon", "midnight") and hour != 12):
+        return None
+    if suffix in ("am", "midnight"):
+        hour %= 12
+    elif suffix == "pm":
+        hour = hour % 12 + 12
+    return hour * 60 + minute
+
+
+def _parse_days(text: str) -> Optional[List[int]]:
+    """Weekdays of a list such as "Mon, Tue" or "Fri-Sat", Monday being 0"""
+    days = []
+    for part in text.split(","):
+        if part.strip() in ("everyday", "daily", "all days"):
+            days.extend(range(7))
+            continue
+        bounds = [DAYS.index(b.strip()[:3]) if b.strip()[:3] in DAYS else None
+                  for b in _RANGE_SPLIT_RE.split(part.strip())]
+        if None in bounds or len(bounds) > 2:
+            return None
+        first, last = bounds[0], bounds[-1]
+        days.extend((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+    return days
+
+
+def _parse_ranges(text: str) -> Optional[List[Interval]]:
+    """Minute ranges of one day's times; a range past midnight ends after 1440"""
+    text = text.strip(" ,")
+    if text == "closed":
+        return []
+    ranges = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part in ("24 hours", "open 24 hours"):
+            ranges.append((0, MINUTES_PER_DAY))
+            continue
+        bounds = _RANGE_SPLIT_RE.split(part)
+        if len(bounds) != 2:
+            return None
+        start, end = parse_time(bounds[0]), parse_time(bounds[1])
+        if start is None or end is None:
+            return None
+        if end <= start:
+            end += MINUTES_PER_DAY
+        ranges.append((start, end))
+    return ranges if ranges else None
+
+
+def parse_timings(text: str) -> Optional[List[Interval]]:
+    """
+    Parse a timings value into [open, close) minutes of the week.
+
+    Returns:
+        The intervals, wrapped from Sunday night into Monday morning, or
+        None if the value cannot be understood
+    """
+    text = text.strip().lower()
+    groups, end = [], 0
+    for match in _GROUP_RE.finditer(text):
+        groups.append((match.group(1), match.group(2)))
+        end = match.end()
+    if text[end:].strip(" ,"):
+        groups.append((text[end:], None))
+    if not groups:
+        return None
+
+    intervals = []
+    for times, days in groups:
+        weekdays = list(range(7)) if days is None else _parse_days(days)
+        ranges = _parse_ranges(times)
+        if weekdays is None or ranges is None:
+            return None
+        for day in weekdays:
+            for start, stop in ranges:
+                start, stop = day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + stop
+                if stop > MINUTES_PER_WEEK:
+                    intervals.append((start, MINUTES_PER_WEEK))
+                    start, stop = 0, stop - MINUTES_PER_WEEK
+                intervals.append((start, stop))
+    return intervals
+
+
+def parse_week_minute(text: str) -> Optional[int]:
+    """Minute of the week of "Fri 19:30" or "friday 7:30 pm" """
+    parts = text.strip().lower().split(None, 1)
+    if len(parts) != 2 or parts[0][:3] not in DAYS:
+        return None
+    minute = parse_time(parts[1])
+    if minute is None or minute >= MINUTES_PER_DAY:
+        return None
+    return DAYS.index(parts[0][:3]) * MINUTES_PER_DAY + minute
+
+
+def current_week_minute(utc_offset_minutes: int) -> int:
+    """Minute of the week now, in the time zone utc_offset_minutes east of UTC"""
+    now = datetime.now(timezone.utc) + timedelta(minutes=utc_offset_minutes)
+    return now.weekday() * MINUTES_PER_DAY + now.hour * 60 + now.minute
+
+
+class OpeningHours:
+    """
+    Opening intervals of every row in CSR layout.
+
+    The intervals of row r are opens[offsets[r]:offsets[r + 1]] and the
+    matching closes, as int16 minutes of the week. Rows whose timings are
+    missing or unparseable have no intervals and are never open.
+    """
+
+    def __init__(self, offsets: np.ndarray, opens: np.ndarray, closes: np.ndarray, status: np.ndarray):
+        self.offsets = offsets
+        self.opens = opens
+        self.closes = closes
+        self.status = status
+
+    @classmethod
+    def build(cls, timings: Iterable[str]) -> "OpeningHours":
+        """Parse every row's timings, each distinct value once"""
+        parsed: Dict[str, Tuple[int, List[Interval]]] = {}
+        counts, statuses, flat = [], [], []
+        for value in timings:
+            if value not in parsed:
+                if value.strip().lower() in _MISSING_VALUES:
+                    parsed[value] = (MISSING, [])
+                else:
+                    intervals = parse_timings(value)
+                    parsed[value] = (UNPARSEABLE, []) if intervals is None else (PARSED, intervals)
+            status, intervals = parsed[value]
+            statuses.append(status)
+            counts.append(len(intervals))
+            flat.extend(intervals)
+
+        offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        bounds = np.array(flat, dtype=np.int16).reshape(-1, 2)
+        return cls(offsets, bounds[:, 0].copy(), bounds[:, 1].copy(), np.array(statuses, dtype=np.int8))
+
+    def open_rows(self, rows: np.ndarray, week_minute: int) -> np.ndarray:
+        """Keep the rows open at week_minute, reading only their own intervals"""
+        starts, ends = self.offsets[rows], self.offsets[rows + 1]
+        counts = ends - starts
+        if counts.sum() == 0:
+            return rows[:0]
+        # Position of every interval of the rows, and the row it belongs to
+        owners = np.repeat(np.arange(len(rows)), counts)
+        first = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum()) - np.repeat(first - starts, counts)
+        inside = (self.opens[positions] <= week_minute) & (week_minute < self.closes[positions])
+        is_open = np.zeros(len(rows), dtype=bool)
+        is_open[owners[inside]] = True
+        return rows[is_open]
+
+    def stats(self) -> Dict[str, int]:
+        """Rows by timings status"""
+        totals = np.bincount(self.status, minlength=3)
+        return {
+            "parsed": int(totals[PARSED]),
+            "missing": int(totals[MISSING]),
+            "unparseable": int(totals[UNPARSEABLE]),
+        }
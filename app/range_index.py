@@ -0,0 +1,100 @@
+"""
+Presorted numeric columns for range filters
+"""
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Filter name -> table column
+RANGE_COLUMNS = {
+    "rating": "rating",
+    "cost": "average_cost_for_two",
+    "votes": "votes",
+}
+
+# A range only intersects by its sorted rows when it is this many times
+# smaller than the candidates; otherwise candidates are compared directly
+_INTERSECT_RATIO = 8
+
+Range = Tuple[float, float]
+
+
+def parse_ranges(bounds: Dict[str, Optional[float]]) -> Dict[str, Range]:
+    """
+    Turn min_<name>/max_<name> bounds into inclusive column ranges.
+
+    Names are those of RANGE_COLUMNS; unset bounds are open.
+    """
+    ranges = {}
+    for name, column in RANGE_COLUMNS.items():
+        lo, hi = bounds.get(f"min_{name}"), bounds.get(f"max_{name}")
+        if lo is not None or hi is not None:
+            ranges[column] = (
+                -math.inf if lo is None else float(lo),
+                math.inf if hi is None else float(hi),
+            )
+    return ranges
+
+
+class RangeIndex:
+    """
+    Row ids of one column sorted by value.
+
+    The rows with values in a range are one contiguous slice, found by
+    binary search, so counting them is O(log n) and listing them O(log n + m).
+    """
+
+    def __init__(self, values: np.ndarray):
+        # A plain view of a memory-mapped column skips memmap's per-operation overhead
+        self.values = np.asarray(values)
+        self.order = np.argsort(values, kind="stable").astype(np.int32)
+        self.sorted_values = values[self.order]
+
+    def _cast(self, lo: float, hi: float) -> Tuple[float, float]:
+        # Bounds of a float32 column are compared as float32, so that 4.1
+        # matches the stored 4.1 rather than the float64 just above it
+        if self.values.dtype.kind == "f":
+            return self.values.dtype.type(lo), self.values.dtype.type(hi)
+        return lo, hi
+
+    def bounds(self, lo: float, hi: float) -> Tuple[int, int]:
+        """Return the [start, end) slice of order with values in [lo, hi]"""
+        lo, hi = self._cast(lo, hi)
+        start = int(np.searchsorted(self.sorted_values, lo, side="left"))
+        end = int(np.searchsorted(self.sorted_values, hi, side="right"))
+        return start, max(start, end)
+
+    def rows(self, lo: float, hi: float) -> np.ndarray:
+        """Return the sorted rows with values in [lo, hi]"""
+        start, end = self.bounds(lo, hi)
+        return np.sort(self.order[start:end])
+
+    def filter(self, rows: np.ndarray, lo: float, hi: float) -> np.ndarray:
+        """Keep the rows with values in [lo, hi]"""
+        lo, hi = self._cast(lo, hi)
+        values = self.values[rows]
+        return rows[(values >= lo) & (values <= hi)]
+
+
+def apply_ranges(indexes: Dict[str, RangeIndex], ranges: Dict[str, Range], rows: np.ndarray) -> np.ndarray:
+    """
+    Restrict sorted rows to those within every range.
+
+    Ranges are applied most selective first. A range much smaller than the
+    remaining rows is intersected through its sorted slice; otherwise the
+    remaining rows' values are compared in one vectorized pass.
+    """
+    selectivity = []
+    for column, (lo, hi) in ranges.items():
+        start, end = indexes[column].bounds(lo, hi)
+        selectivity.append((end - start, column, lo, hi))
+
+    for count, column, lo, hi in sorted(selectivity):
+        if len(rows) == 0:
+            break
+        if count * _INTERSECT_RATIO < len(rows):
+            rows = np.intersect1d(rows, indexes[column].rows(lo, hi), assume_unique=True)
+        else:
+            rows = indexes[column].filter(rows, lo, hi)
+    return rows
@@ -0,0 +1,147 @@
+"""
+Ranking of candidate rows on numeric column arrays
+"""
+import base64
+import binascii
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class ScoringWeights:
+    """Weights of the components of a restaurant's score"""
+    # How exactly the dish matched: 1 exact cuisine, 0.5 cuisine token, 0.25 name only
+    match: float = 0.0
+    # Aggregate rating (0-5)
+    rating: float = 1.0
+    # log(1 + votes)
+    votes: float = 0.0
+    # Closeness of the cost for two to the requested cost (0-1)
+    cost: float = 0.0
+    # Closeness to the searched point, 1 at the point and 0 at the radius
+    distance: float = 0.0
+
+
+# Selectable per request through rank_by
+SCORING_PROFILES = {
+    "rating": ScoringWeights(),
+    "relevance": ScoringWeights(match=100.0, rating=10.0, votes=2.0, cost=20.0, distance=20.0),
+    "nearby": ScoringWeights(rating=1.0, votes=0.2, distance=5.0),
+}
+
+
+def score_rows(
+    weights: ScoringWeights,
+    match: Optional[np.ndarray],
+    ratings: np.ndarray,
+    votes: np.ndarray,
+    costs: np.ndarray,
+    target_cost: Optional[int] = None,
+    closeness: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Compute the weighted score of every candidate as whole-array operations.
+
+    All arrays are aligned with the candidate rows; match may be None when
+    its weight is zero, and closeness is None outside radius searches.
+    """
+    # float32 ratings are rounded back to their decimal values, so scores
+    # are those of the published ratings
+    scores = weights.rating * np.round(ratings.astype(np.float64), 2)
+    if weights.match and match is not None:
+        scores += weights.match * match
+    if weights.votes:
+        scores += weights.votes * np.log1p(np.maximum(votes, 0))
+    if weights.cost and target_cost:
+        distance = np.abs(costs.astype(np.float64) - target_cost) / target_cost
+        scores += weights.cost * (1.0 - np.minimum(distance, 1.0))
+    if weights.distance and closeness is not None:
+        scores += weights.distance * closeness
+    return scores
+
+
+def dedupe_rows(rows: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Drop rows whose key already appeared earlier.
+
+    Args:
+        rows: Sorted candidate row ids
+        keys: Precomputed duplicate key of every table row
+
+    Returns:
+        The first row of each key, still sorted
+    """
+    if len(rows) < 2:
+        return rows
+    _, first = np.unique(keys[rows], return_index=True)
+    return rows[np.sort(first)]
+
+
+def top_k(rows: np.ndarray, scores: np.ndarray, votes: np.ndarray, k: int) -> np.ndarray:
+    """
+    Select the k best rows by score, breaking ties by votes, then row id.
+
+    Only rows scoring at least the k-th best score are sorted, so the cost
+    is a linear partial selection plus a sort of roughly k rows.
+
+    Args:
+        rows: Candidate row ids
+        scores: Score of every candidate, aligned with rows
+        votes: Vote count of every candidate, aligned with rows
+        k: Number of rows to return
+
+    Returns:
+        Up to k row ids in ranking order
+    """
+    if k <= 0 or len(rows) == 0:
+        return rows[:0]
+    if len(rows) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        rows, scores, votes = rows[keep], scores[keep], votes[keep]
+    return rows[rank_order(rows, scores, votes)[:k]]
+
+
+def rank_order(rows: np.ndarray, scores: np.ndarray, votes: np.ndarray) -> np.ndarray:
+    """Positions of all the candidates in ranking order, as top_k ranks them"""
+    return np.lexsort((rows, -votes, -scores))
+
+
+def ranked_after(rows: np.ndarray, scores: np.ndarray, votes: np.ndarray,
+                 score: float, vote: int, row: int) -> np.ndarray:
+    """
+    Mask of the candidates ranked after (score, vote, row) in top_k order:
+    lower score, then fewer votes, then higher row id.
+    """
+    return (scores < score) | ((scores == score) & ((votes < vote) | ((votes == vote) & (rows > row))))
+
+
+# Score, row id and a checksum of the dataset version
+_CURSOR = struct.Struct("<dqI")
+
+
+def encode_cursor(score: float, row: int, version: str) -> str:
+    """Opaque cursor resuming a ranking after the given row"""
+    packed = _CURSOR.pack(score, row, zlib.crc32(version.encode()))
+    return base64.urlsafe_b64encode(packed).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, version: str) -> Tuple[float, int]:
+    """
+    Return the score and row id of a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or from another dataset version
+    """
+    try:
+        packed = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, row, checksum = _CURSOR.unpack(packed)
+    except (binascii.Error, struct.error, UnicodeEncodeError):
+        raise ValueError("Malformed cursor")
+    if checksum != zlib.crc32(version.encode()):
+        raise ValueError("Cursor is from an older dataset, restart the search")
+    return score, row
@@ -0,0 +1,127 @@
+"""
+Restaurant records serialized to JSON once, at dataset load
+
+Search responses are assembled by concatenating the fragments of the
+winning rows instead of building a dict per restaurant and encoding it
+again on every request.
+"""
+import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .restaurant_table import RestaurantTable
+
+# Matches FastAPI's JSONResponse output
+_ENCODER = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _text_or_none(value: str) -> Optional[str]:
+    """Return value, or None for values missing in the dataset"""
+    return value or None
+
+
+def restaurant_record(data: RestaurantTable, row: int) -> Dict[str, Any]:
+    """Build the public dictionary for one row of the table"""
+    def text(col: str, default: Optional[str] = None) -> Optional[str]:
+        return data[col][row] if col in data else default
+
+    return {
+        'restaurant_name': text('restaurant_name', 'Unnamed Restaurant'),
+        'address': text('address', text('location', 'Address not available')),
+        'locality': text('locality', 'Locality not available'),
+        'city': text('location', 'City not available'),
+        'cuisines': text('cuisines', 'Cuisines not specified'),
+        'url': _text_or_none(text('url')),
+        'menu_url': _text_or_none(text('menu_url')),
+        'image_url': _text_or_none(text('image_url')),
+        # Ratings are stored as float32; rounding recovers the published value
+        'rating': round(float(data['rating'][row]), 2),
+        'rating_text': text('rating_text') or 'No rating',
+        'votes': int(data['votes'][row]),
+        'average_cost_for_two': int(data['average_cost_for_two'][row]),
+    }
+
+
+class RecordFragments:
+    """
+    The JSON object of every row, UTF-8 encoded and packed into one buffer.
+
+    Row r's object is blob[offsets[r]:offsets[r + 1]].
+    """
+
+    def __init__(self, blob: bytes, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, data: RestaurantTable) -> "RecordFragments":
+        """Serialize every row of the table"""
+        fragments = [_ENCODER.encode(restaurant_record(data, row)).encode() for row in range(len(data))]
+        offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+        np.cumsum([len(fragment) for fragment in fragments], out=offsets[1:])
+        return cls(b"".join(fragments), offsets)
+
+    def fragment(self, row: int, distance_km: Optional[float] = None) -> bytes:
+        """Row's JSON object, with distance_km added when given"""
+        fragment = self.blob[self.offsets[row]:self.offsets[row + 1]]
+        if distance_km is None:
+            return fragment
+        return b"%s,\"distance_km\":%s}" % (fragment[:-1], repr(distance_km).encode())
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.blob) + self.offsets.nbytes
+
+
+class ResultRows:
+    """
+    Ranked result rows of one search, rendered from their fragments only
+    when the response is written.
+
+    distances holds each row's distance_km for radius searches.
+    """
+
+    __slots__ = ("fragments", "rows", "distances")
+
+    def __init__(self, fragments: RecordFragments, rows: Sequence[int],
+                 distances: Optional[Sequence[float]] = None):
+        self.fragments = fragments
+        self.rows = rows
+        self.distances = distances
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _fragments(self) -> Iterator[bytes]:
+        distances = self.distances if self.distances is not None else [None] * len(self.rows)
+        for row, distance in zip(self.rows, distances):
+            yield self.fragments.fragment(row, distance)
+
+    def to_json(self) -> bytes:
+        """The results as a JSON array"""
+        return b"[%s]" % b",".join(self._fragments())
+
+    def to_ndjson(self) -> bytes:
+        """The results as newline-delimited JSON, one per line"""
+        return b"".join(fragment + b"\n" for fragment in self._fragments())
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """The results as dicts, for Python callers"""
+        return json.loads(self.to_json())
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    Encode a response as FastAPI would, splicing in the fragments of any
+    ResultRows found in its dicts and lists.
+    """
+    if isinstance(value, ResultRows):
+        return value.to_json()
+    if isinstance(value, dict):
+        return b"{%s}" % b",".join(
+            b"%s:%s" % (_ENCODER.encode(str(key)).encode(), encode_json(item)) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return b"[%s]" % b",".join(encode_json(item) for item in value)
+    return _ENCODER.encode(value).encode()
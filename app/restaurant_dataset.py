@@ -0,0 +1,193 @@
+"""
+Restaurant dataset: the loaded table together with its derived indexes
+"""
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+import numpy as np
+
+from .facets import Facets
+from .fuzzy_index import TrigramIndex
+from .geo_index import GeoIndex
+from .highlight_index import HighlightIndex
+from .location_index import LocationIndex
+from .opening_hours import OpeningHours
+from .range_index import RANGE_COLUMNS, RangeIndex
+from .record_fragments import RecordFragments
+from .restaurant_table import Column, RestaurantTable, StringColumn
+from .suggest_index import Suggestions
+from .text_index import TokenIndex, split_entries
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze_arrays(value: Any, seen: Set[int]) -> None:
+    """Mark every NumPy array reachable from value read-only"""
+    if id(value) in seen:
+        return
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze_arrays(item, seen)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze_arrays(item, seen)
+    elif hasattr(value, "__dict__") or hasattr(value, "__slots__"):
+        for name in getattr(value, "__slots__", ()):
+            _freeze_arrays(getattr(value, name, None), seen)
+        for item in getattr(value, "__dict__", {}).values():
+            _freeze_arrays(item, seen)
+
+
+def _timed(label: str, build: Callable[[RestaurantTable], Dict[str, Column]]
+           ) -> Callable[[RestaurantTable], Dict[str, Column]]:
+    """Wrap an index builder to log how long it took"""
+    def timed(table: RestaurantTable) -> Dict[str, Column]:
+        started = time.perf_counter()
+        columns = build(table)
+        logger.info(f"Built {label} in {time.perf_counter() - started:.2f}s")
+        return columns
+    return timed
+
+
+def _fragment_columns(table: RestaurantTable) -> Dict[str, Column]:
+    """Every row's JSON record"""
+    started = time.perf_counter()
+    fragments = RecordFragments.build(table)
+    logger.info(
+        f"Serialized {len(table)} restaurant records ({fragments.nbytes / 2**20:.1f} MiB) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return {"fragments": StringColumn(fragments.blob, fragments.offsets)}
+
+
+# Indexes kept in the dataset snapshot, by name: each builds columns named
+# after it, or "<name>.<part>" when it needs several
+STORED_INDEXES: Dict[str, Callable[[RestaurantTable], Dict[str, Column]]] = {
+    "dish_index": _timed("dish index", lambda table: TokenIndex.build(
+        [table["cuisines"], table["restaurant_name"]]
+    ).to_columns("dish_index")),
+    # Cuisine tokens and whole cuisine entries, for match exactness
+    "cuisine_index": _timed("cuisine index", lambda table: TokenIndex.build(
+        [table["cuisines"]]
+    ).to_columns("cuisine_index")),
+    "cuisine_entries": _timed("cuisine entry index", lambda table: TokenIndex.build(
+        [table["cuisines"]], tokenizer=split_entries
+    ).to_columns("cuisine_entries")),
+    "location_index": _timed("location index", lambda table: LocationIndex.build(
+        table["location"], table["locality"], table["address"]
+    ).to_columns("location_index")),
+    "fragments": _fragment_columns,
+}
+
+
+def stored_indexes(table: RestaurantTable, stored: Optional[Dict[str, Column]] = None) -> Dict[str, Column]:
+    """
+    Return the columns of every index in STORED_INDEXES: those already in
+    stored (mapped from the snapshot), and any others built from table.
+    """
+    columns = dict(stored or {})
+    for name, build in STORED_INDEXES.items():
+        if not any(key == name or key.startswith(f"{name}.") for key in columns):
+            columns.update(build(table))
+    return columns
+
+
+class RestaurantDataset:
+    """
+    A loaded restaurant table plus every index built from it.
+
+    Indexes are built once when the dataset is loaded; queries only read
+    them. Those of STORED_INDEXES are written to the snapshot with the
+    table, and every worker maps them from it instead. Once built, the
+    dataset is frozen: its attributes cannot be reassigned and every array
+    it reaches is read-only, so any number of search threads can share it
+    without locks.
+    """
+
+    _frozen = False
+
+    def __init__(self, table: RestaurantTable, stored: Optional[Dict[str, Column]] = None):
+        stored = stored_indexes(table, stored)
+        self.table = table
+        self.version = table.version
+        self.all_rows = np.arange(len(table), dtype=np.int32)
+
+        self.dish_index = TokenIndex.from_columns(stored, "dish_index")
+        self.cuisine_index = TokenIndex.from_columns(stored, "cuisine_index")
+        self.cuisine_entries = TokenIndex.from_columns(stored, "cuisine_entries")
+        self.location_index = LocationIndex.from_columns(stored, "location_index")
+        self.fragments = RecordFragments(stored["fragments"].buffer, stored["fragments"].offsets)
+        logger.info(
+            f"Opened dish index with {len(self.dish_index)} tokens and location index "
+            f"with {len(self.location_index.cities)} cities"
+        )
+
+        started = time.perf_counter()
+        self.geo_index = GeoIndex.build(table["latitude"], table["longitude"])
+        logger.info(
+            f"Built geo index over {len(self.geo_index)} located rows "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+        started = time.perf_counter()
+        self.range_indexes = {column: RangeIndex(table[column]) for column in RANGE_COLUMNS.values()}
+        logger.info(f"Built range indexes in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        self.highlight_index = HighlightIndex.build(table["highlights"], len(table))
+        logger.info(
+            f"Built highlight bitmaps for {len(self.highlight_index)} tags "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+        started = time.perf_counter()
+        self.opening_hours = OpeningHours.build(table["timings"])
+        timings = self.opening_hours.stats()
+        logger.info(
+            f"Parsed timings in {time.perf_counter() - started:.2f}s: {timings['parsed']} rows parsed, "
+            f"{timings['missing']} missing, {timings['unparseable']} unparseable"
+        )
+
+        # Vocabularies for correcting misspelled dishes and places
+        started = time.perf_counter()
+        counts = np.diff(self.dish_index.starts).tolist()
+        self.dish_spelling = TrigramIndex.build(dict(zip(self.dish_index.tokens, counts)))
+        places = {city: len(rows) for city, rows in self.location_index.cities.items()}
+        for locality, rows in self.location_index.all_localities.items():
+            # Localities also match by their leading words ("koramangala 5th block")
+            words = locality.split()
+            for end in range(1, len(words) + 1):
+                prefix = " ".join(words[:end])
+                places[prefix] = places.get(prefix, 0) + len(rows)
+        self.place_spelling = TrigramIndex.build(places)
+        logger.info(
+            f"Built spelling indexes over {len(self.dish_spelling)} dish and "
+            f"{len(self.place_spelling)} place terms in {time.perf_counter() - started:.2f}s"
+        )
+
+        started = time.perf_counter()
+        self.facets = Facets.build(table, self.location_index)
+        logger.info(f"Built city/locality/dish facets in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        self.suggestions = Suggestions.build(table, self.location_index, self.cuisine_entries)
+        logger.info(f"Built autocomplete indexes in {time.perf_counter() - started:.2f}s")
+
+        _freeze_arrays(self.__dict__, set())
+        self._frozen = True
+
+    def __setattr__(self, name: str, value) -> None:
+        if self._frozen:
+            raise AttributeError(f"RestaurantDataset is read-only, cannot set {name}")
+        super().__setattr__(name, value)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @property
+    def empty(self) -> bool:
+        return self.table.empty
@@ -1,208 +1,1043 @@
 """
 Restaurant finder service using Zomato dataset
 """
+import io
+import numpy as np
 import pandas as pd
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
 import logging
+import multiprocessing
+
+from .config import (
+    BASE_DIR,
+    DATASET_DROP_COLUMNS,
+    DATASET_INGEST_WORKERS,
+    DATASET_PATH,
+    DATASET_SNAPSHOT_ENABLED,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    SEARCH_STREAM_BATCH,
+)
+from .csv_chunks import read_range, split_csv
+from .dataset_cache import build_lock, file_digest, load_snapshot, save_snapshot, snapshot_matches
+from .location_index import normalize_place
+from .ranking import (
+    SCORING_PROFILES,
+    ScoringWeights,
+    decode_cursor,
+    dedupe_rows,
+    encode_cursor,
+    rank_order,
+    ranked_after,
+    score_rows,
+    top_k,
+)
+from .record_fragments import ResultRows
+from .restaurant_dataset import RestaurantDataset, stored_indexes
+from .restaurant_table import Column, RestaurantTable
+from .search_cache import SearchCache
+from .search_planner import (
+    RELAXATION_TIERS,
+    STRICT_TIERS,
+    QueryPlan,
+    RelaxationTier,
+    SearchFilters,
+    run_plan,
+)
+from .text_index import normalize_phrase
 
 logger = logging.getLogger(__name__)
 
-# Global variable to store the restaurant data
-df = None
+# Global variable to store the restaurant table and its indexes
+dataset = None
+_load_lock = threading.Lock()
+_reload_lock = threading.Lock()
 
+# Results of recent searches, invalidated when the dataset version changes
+search_cache = SearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
 
-def load_data():
-    """Load restaurant data from CSV file"""
-    global df
-    if df is not None:
-        return df
-        
-    logger.info("Starting to load restaurant data")
+# Possible paths to the dataset, relative to the project root
+DATASET_CANDIDATES = [
+    os.path.join('zomato_restaurants_in_India.csv'),
+    os.path.join('major project', 'zomato_restaurants_in_India.csv'),
+]
+
+# Columns the search indexes are built from, the address feeding the
+# location index; only the remaining columns may be dropped with
+# DATASET_DROP_COLUMNS
+REQUIRED_COLUMNS = {
+    'restaurant_name', 'location', 'locality', 'address', 'cuisines', 'rating', 'votes',
+    'average_cost_for_two', 'latitude', 'longitude', 'highlights', 'timings', 'dedupe_key',
+}
+
+# Define column mappings
+COLUMN_MAPPINGS = {
+    'name': 'restaurant_name',
+    'restaurant_name': 'restaurant_name',
+    'city': 'location',
+    'locality': 'locality',
+    'address': 'address',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'cuisines': 'cuisines',
+    'aggregate_rating': 'rating',
+    'rating_text': 'rating_text',
+    'votes': 'votes',
+    'average_cost_for_two': 'average_cost_for_two',
+    'thumb': 'image_url',
+    'featured_image': 'image_url',
+    'photos_url': 'image_url',
+    'menu_url': 'menu_url',
+    'url': 'url',
+    'timings': 'timings',
+    'highlights': 'highlights'
+}
+
+# Source columns read as text even when one stretch of the file looks
+# numeric, so every chunk of a parallel read parses them alike
+TEXT_SOURCE_COLUMNS = [k for k, v in COLUMN_MAPPINGS.items() if v not in (
+    'rating', 'votes', 'average_cost_for_two', 'latitude', 'longitude')]
+
+# Smallest stretch of the CSV worth handing to another process
+INGEST_MIN_CHUNK_BYTES = 4 << 20
+
+
+def locate_dataset() -> Optional[str]:
+    """Return the path of the dataset CSV, or None if it cannot be found, without logging"""
+    if DATASET_PATH:
+        return DATASET_PATH if os.path.exists(DATASET_PATH) else None
+
+    # Try each possible path
+    for path in DATASET_CANDIDATES:
+        full_path = os.path.join(BASE_DIR, path)
+        if os.path.exists(full_path):
+            return full_path
+    return None
+
+
+def find_dataset_path() -> Optional[str]:
+    """Return the path of the dataset CSV, or None if it cannot be found"""
+    path = locate_dataset()
+    if path is not None:
+        logger.info(f"Found file at: {path}")
+    elif DATASET_PATH:
+        logger.error(f"DATASET_PATH does not exist: {DATASET_PATH}")
+    else:
+        logger.debug(f"Tried paths: {', '.join(DATASET_CANDIDATES)}")
+    return path
+
+
+class _StepTimer:
+    """Durations of consecutive steps, for one log line"""
+
+    def __init__(self):
+        self.steps: List[Tuple[str, float]] = []
+        self._last = time.perf_counter()
+
+    def mark(self, step: str) -> None:
+        now = time.perf_counter()
+        self.steps.append((step, now - self._last))
+        self._last = now
+
+    def __str__(self) -> str:
+        total = sum(seconds for _, seconds in self.steps)
+        return f"{total:.2f}s (" + ", ".join(f"{step} {seconds * 1000:.0f}ms" for step, seconds in self.steps) + ")"
+
+
+def _clean_text(values: pd.Series) -> pd.Series:
+    """
+    Missing values become '' and the rest are stripped.
+
+    Zomato text repeats heavily, so each distinct value is cleaned once and
+    the results are gathered back by code.
+    """
+    codes, uniques = pd.factorize(values)
+    cleaned = pd.Index(uniques).astype(str).str.strip().to_numpy(dtype=object)
+    # -1 picks the appended '' for missing values
+    return pd.Series(np.append(cleaned, '')[codes], index=values.index)
+
+
+def normalize_data(raw: pd.DataFrame, dedupe: bool = True) -> pd.DataFrame:
+    """
+    Rename, coerce and clean the raw Zomato columns into the search table.
+
+    Every step works on whole columns; the time of each is logged. Chunks of
+    a parallel read skip dedupe, which needs every row, and get their
+    dedupe_key once merged (see add_dedupe_keys).
+    """
+    timer = _StepTimer()
+
+    # Only use columns that exist in the dataframe
+    columns_to_keep = {k: v for k, v in COLUMN_MAPPINGS.items() if k in raw.columns}
+
+    # Rename columns and keep only the columns we need
+    data = raw.rename(columns=columns_to_keep)
+    data = data[list(set(columns_to_keep.values()))].copy()
+
+    # Add any missing columns with default values
+    for col in ['rating', 'votes', 'average_cost_for_two', 'restaurant_name', 'location', 'locality', 'address', 'cuisines', 'highlights', 'timings']:
+        if col not in data.columns:
+            data[col] = ''
+    timer.mark("rename")
+
+    # Convert data types
+    # Narrowest types that hold the data: ratings have one decimal, and votes
+    # and costs stay far below 2**31
+    data['rating'] = pd.to_numeric(data['rating'], errors='coerce').fillna(0).astype(np.float32)
+    data['votes'] = pd.to_numeric(data['votes'], errors='coerce').fillna(0).astype(np.int32)
+    data['average_cost_for_two'] = pd.to_numeric(data['average_cost_for_two'], errors='coerce').fillna(0).astype(np.int32)
+
+    # Coordinates stay NaN when missing
+    for col in ['latitude', 'longitude']:
+        data[col] = pd.to_numeric(data[col], errors='coerce') if col in data.columns else np.nan
+    timer.mark("numbers")
+
+    # Clean up text data
+    for col in ['restaurant_name', 'location', 'locality', 'address', 'cuisines', 'highlights', 'timings']:
+        data[col] = _clean_text(data[col])
+    timer.mark("text")
+
+    # Combine the city with the locality when it adds something
+    location, locality = data['location'], data['locality']
+    combine = (locality != '') & (locality != location)
+    data['location'] = location.where(~combine, location + ', ' + locality)
+    timer.mark("location")
+
+    if dedupe:
+        add_dedupe_keys(data)
+        timer.mark("dedupe")
+
+    logger.info(f"Normalized {len(data)} rows in {timer}")
+    return data
+
+
+def add_dedupe_keys(data: pd.DataFrame) -> None:
+    """Rows sharing a name and location are duplicates of one restaurant"""
+    data['dedupe_key'] = data.groupby(['restaurant_name', 'location'], sort=False).ngroup().astype(np.int32)
+
+
+def column_report(before: Dict[str, int], after: Dict[str, int]) -> str:
+    """Tabulate bytes per column before and after compaction"""
+    lines = [f"{'column':<24}{'before':>14}{'after':>14}"]
+    for name in sorted(set(before) | set(after), key=lambda n: -before.get(n, 0)):
+        lines.append(f"{name:<24}{before.get(name, 0):>14,}{after.get(name, 0):>14,}")
+    lines.append(f"{'total':<24}{sum(before.values()):>14,}{sum(after.values()):>14,}")
+    return "\n".join(lines)
+
+
+def _read_csv(source) -> pd.DataFrame:
+    """Parse CSV text from a path or file object"""
+    return pd.read_csv(source, dtype={name: str for name in TEXT_SOURCE_COLUMNS}, low_memory=False)
+
+
+def _parsed_sizes(raw: pd.DataFrame) -> Dict[str, int]:
+    """Estimate the bytes of each mapped column as parsed"""
+    # Measuring every Python string is slow, so the parsed size is
+    # extrapolated from evenly spaced rows
+    step = max(1, len(raw) // 20000)
+    sample = raw.iloc[::step]
+    scale = len(raw) / max(len(sample), 1)
+    return {
+        COLUMN_MAPPINGS[name]: int(size * scale)
+        for name, size in sample.memory_usage(index=False, deep=True).items() if name in COLUMN_MAPPINGS
+    }
+
+
+def _ingest_chunk(path: str, header: bytes, start: int, end: int) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """Parse and normalize bytes [start, end) of the CSV in a pool process"""
+    raw = _read_csv(io.BytesIO(header + read_range(path, start, end)))
+    return normalize_data(raw, dedupe=False), _parsed_sizes(raw)
+
+
+def _ingest_workers() -> int:
+    """Processes to parse the CSV with; 0 in the config means one per core"""
+    return DATASET_INGEST_WORKERS if DATASET_INGEST_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def _read_parallel(path: str, workers: int, timer: _StepTimer) -> Optional[Tuple[pd.DataFrame, Dict[str, int]]]:
+    """
+    Parse and normalize the CSV in byte-range chunks on a process pool.
+
+    Returns None when the file is too small to be worth splitting or the
+    pool fails, so the caller falls back to a single read.
+    """
+    header, ranges = split_csv(path, workers, INGEST_MIN_CHUNK_BYTES)
+    if len(ranges) < 2:
+        return None
+    timer.mark("split")
+
+    # Spawned workers, since forking a process running the search threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as pool:
+            futures = [pool.submit(_ingest_chunk, path, header, start, end) for start, end in ranges]
+            chunks = [future.result() for future in futures]
+    except Exception as e:
+        logger.warning(f"Parallel CSV read failed, reading in one pass: {str(e)}")
+        return None
+    timer.mark("parse")
+
+    data = pd.concat([frame for frame, _ in chunks], ignore_index=True)
+    # The duplicate groups span chunks, so they are found on the merged rows
+    add_dedupe_keys(data)
+    before: Dict[str, int] = {}
+    for _, sizes in chunks:
+        for name, size in sizes.items():
+            before[name] = before.get(name, 0) + size
+    timer.mark("merge")
+    logger.info(f"Parsed {len(data)} rows from CSV in {len(ranges)} parallel chunks")
+    return data, before
+
+
+def read_dataset(path: str) -> RestaurantTable:
+    """
+    Parse and normalize the dataset CSV into an in-memory table.
+
+    With DATASET_INGEST_WORKERS above 1, large files are split across that
+    many processes.
+    """
+    timer = _StepTimer()
+    workers = _ingest_workers()
+    parallel = _read_parallel(path, workers, timer) if workers > 1 else None
+    if parallel is not None:
+        data, before = parallel
+    else:
+        raw = _read_csv(path)
+        timer.mark("csv")
+        logger.info(f"Successfully loaded {len(raw)} rows from CSV")
+        logger.info(f"Available columns: {', '.join(raw.columns.tolist())}")
+        before = _parsed_sizes(raw)
+        timer.mark("measure")
+        data = normalize_data(raw)
+        timer.mark("normalize")
+    table = RestaurantTable.from_frame(data)
+    timer.mark("compact")
+    logger.info(f"Bytes per column as parsed (estimated) and as a compact table:\n{column_report(before, table.memory_usage())}")
+    logger.info(f"Read dataset in {timer}")
+    return table
+
+
+def compile_dataset(path: Optional[str] = None, force: bool = False) -> bool:
+    """
+    Build the binary dataset snapshot ahead of time.
+
+    Args:
+        path: CSV to compile (defaults to the configured dataset)
+        force: Rebuild even if the existing snapshot is up to date
+
+    Returns:
+        True if an up-to-date snapshot is available afterwards
+    """
+    path = path or find_dataset_path()
+    if path is None:
+        logger.error("Could not find the dataset file to compile.")
+        return False
+
+    if not force and snapshot_matches(path):
+        logger.info("Dataset snapshot is already up to date")
+        return True
+
+    with build_lock():
+        data = read_dataset(path)
+        save_snapshot(path, data, stored_indexes(data))
+    return True
+
+
+def load_dataset() -> Optional[RestaurantDataset]:
+    """
+    Load the restaurant table, preferring the memory-mapped snapshot, and
+    build its search indexes.
+
+    A worker that has to parse the CSV itself writes the snapshot and then
+    maps it like every other worker, so its private copy is released.
+    """
+    global dataset
+    if dataset is not None:
+        return dataset
     
-    # Possible paths to the dataset
-    possible_paths = [
-        os.path.join('zomato_restaurants_in_India.csv'),
-        os.path.join('major project', 'zomato_restaurants_in_India.csv'),
-    ]
+    # Search threads may all ask for the dataset before the first load ends
+    with _load_lock:
+        if dataset is None:
+            dataset = _load_dataset()
+    return dataset
+
+
+def _load_dataset() -> Optional[RestaurantDataset]:
+    """Build the dataset from the snapshot or CSV"""
+    logger.info("Starting to load restaurant data")
     
     try:
-        # Try each possible path
-        for path in possible_paths:
-            full_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
-            logger.debug(f"Trying path: {full_path}")
-            
-            if os.path.exists(full_path):
-                logger.info(f"Found file at: {full_path}")
-                
-                try:
-                    df = pd.read_csv(full_path, low_memory=False)
-                    logger.info(f"Successfully loaded {len(df)} rows from CSV")
-                    logger.info(f"Available columns: {', '.join(df.columns.tolist())}")
-                    break
-                except Exception as e:
-                    logger.error(f"Error reading CSV: {e}")
-        
-        if df is None:
+        path = find_dataset_path()
+        if path is None:
             logger.error("Could not find or load the dataset file.")
             return None
-            
-        # Define column mappings
-        column_mappings = {
-            'name': 'restaurant_name',
-            'restaurant_name': 'restaurant_name',
-            'city': 'location',
-            'locality': 'locality',
-            'address': 'address',
-            'cuisines': 'cuisines',
-            'aggregate_rating': 'rating',
-            'rating_text': 'rating_text',
-            'votes': 'votes',
-            'average_cost_for_two': 'average_cost_for_two',
-            'thumb': 'image_url',
-            'featured_image': 'image_url',
-            'photos_url': 'image_url',
-            'menu_url': 'menu_url',
-            'url': 'url',
-            'timings': 'timings',
-            'highlights': 'highlights'
-        }
-        
-        # Only use columns that exist in the dataframe
-        columns_to_keep = {k: v for k, v in column_mappings.items() if k in df.columns}
-        
-        # Rename columns
-        df = df.rename(columns=columns_to_keep)
-        
-        # Keep only the columns we need
-        df = df[list(set(columns_to_keep.values()))]
-        
-        # Add any missing columns with default values
-        for col in ['rating', 'votes', 'average_cost_for_two', 'locality', 'address', 'cuisines']:
-            if col not in df.columns:
-                df[col] = ''
-        
-        # Convert data types
-        df['rating'] = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
-        df['votes'] = pd.to_numeric(df['votes'], errors='coerce').fillna(0).astype(int)
-        df['average_cost_for_two'] = pd.to_numeric(df['average_cost_for_two'], errors='coerce').fillna(0).astype(int)
-        
-        # Clean up text data
-        for col in ['restaurant_name', 'location', 'locality', 'address', 'cuisines']:
-            if col in df.columns:
-                df[col] = df[col].fillna('').astype(str).str.strip()
-        
-        # Create a combined location string if locality is available
-        if 'locality' in df.columns and 'location' in df.columns:
-            df['location'] = df.apply(
-                lambda x: f"{x['location']}, {x['locality']}" if x['locality'] and x['locality'] != x['location'] else x['location'],
-                axis=1
-            )
-        
-        logger.info(f"Successfully processed {len(df)} restaurants")
-        return df
+
+        if DATASET_SNAPSHOT_ENABLED:
+            snapshot = load_snapshot(path)
+            if snapshot is None:
+                # Other workers wait here, then map the snapshot the first one wrote
+                with build_lock():
+                    snapshot = load_snapshot(path) or _build_snapshot(path)
+            data, stored = snapshot
+        else:
+            data, stored = read_dataset(path), None
+        if not data.version:
+            data.version = file_digest(path)[:16]
+
+        dropped = [name for name in DATASET_DROP_COLUMNS if name in data and name not in REQUIRED_COLUMNS]
+        if dropped:
+            data = data.without(dropped)
+            logger.info(f"Dropped unused columns: {', '.join(dropped)}")
+            # The stored records render every column, so they are rebuilt without these
+            stored = {name: col for name, col in (stored or {}).items() if name != "fragments"}
+
+        loaded = RestaurantDataset(data, stored)
+        logger.info(f"Successfully processed {len(loaded)} restaurants")
+        return loaded
         
     except Exception as e:
         logger.error(f"Error loading data: {str(e)}", exc_info=True)
         return None
 
 
-def find_restaurants(dish: str, location: str, top_n: int = 10) -> List[Dict[str, Any]]:
+def _build_snapshot(path: str) -> Tuple[RestaurantTable, Dict[str, Column]]:
+    """
+    Parse the CSV, write its snapshot and map it, or keep the parsed table
+    and indexes if writing fails.
+    """
+    data = read_dataset(path)
+    stored = stored_indexes(data)
+    try:
+        save_snapshot(path, data, stored)
+        return load_snapshot(path) or (data, stored)
+    except Exception as e:
+        logger.warning(f"Could not write dataset snapshot: {e}")
+        return data, stored
+
+
+def reload_dataset(force: bool = False) -> Dict[str, Any]:
+    """
+    Build the dataset again from the current CSV and swap it in.
+
+    The new table and all its indexes are built on the calling thread while
+    searches keep using the current dataset, then replace it in a single
+    assignment. Searches already running hold their own reference, finish
+    on the old version, and the old version is freed once the last of them
+    returns.
+
+    Args:
+        force: Rebuild even if the CSV content has not changed
+
+    Returns:
+        status: "reloaded", "unchanged" or "failed"
+        version: The version served afterwards
+        previous_version: The version served before
+    """
+    global dataset
+    with _reload_lock:
+        current = dataset
+        previous_version = current.version if current is not None else None
+        path = find_dataset_path()
+        if path is None:
+            logger.error("Could not find the dataset file to reload.")
+            return {"status": "failed", "version": previous_version, "previous_version": previous_version}
+        if not force and current is not None and file_digest(path)[:16] == current.version:
+            logger.info("Dataset content is unchanged, keeping the loaded version")
+            return {"status": "unchanged", "version": previous_version, "previous_version": previous_version}
+
+        started = time.perf_counter()
+        fresh = _load_dataset()
+        if fresh is None:
+            logger.error(f"Reload failed, still serving dataset version {previous_version}")
+            return {"status": "failed", "version": previous_version, "previous_version": previous_version}
+
+        dataset = fresh
+        # Drop results that would keep the old version's records alive
+        search_cache.clear()
+        logger.info(
+            f"Swapped dataset version {previous_version} for {fresh.version} "
+            f"after {time.perf_counter() - started:.2f}s"
+        )
+        return {"status": "reloaded", "version": fresh.version, "previous_version": previous_version}
+
+
+def load_data() -> Optional[RestaurantTable]:
+    """Load the restaurant table"""
+    loaded = load_dataset()
+    return loaded.table if loaded is not None else None
+
+
+def normalize_query(dish: str, location: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], str]:
+    """
+    Normalize search text into the terms used for matching and caching.
+
+    Dish terms match independently, so they are deduplicated and sorted;
+    location terms are kept in order because the first one scopes the rest.
+    The whole dish is also kept as one phrase, which is how multi-word
+    cuisines such as "north indian" match exactly.
+    """
+    dish_terms = {normalize_phrase(term) for term in dish.split()}
+    location_terms = (normalize_place(loc) for loc in location.split(','))
+    return tuple(sorted(t for t in dish_terms if t)), tuple(t for t in location_terms if t), normalize_phrase(dish)
+
+
+def _match_exactness(loaded: RestaurantDataset, rows: np.ndarray, dish_terms: Tuple[str, ...],
+                     dish_phrase: str) -> np.ndarray:
+    """
+    Score how exactly each candidate matched the dish.
+
+    1.0 when the whole dish phrase or a term is one of the row's cuisines,
+    0.5 when a term only prefixes a cuisine token, and 0.25 when it matched
+    the restaurant name alone.
+    """
+    exact = loaded.cuisine_entries.postings(dish_phrase) if dish_phrase else np.zeros(0, dtype=np.int32)
+    partial = np.zeros(0, dtype=np.int32)
+    for term in dish_terms:
+        exact = np.union1d(exact, loaded.cuisine_entries.postings(term))
+        partial = np.union1d(partial, loaded.cuisine_index.match(term))
+    match = np.full(len(rows), 0.25)
+    match[np.isin(rows, partial, assume_unique=True)] = 0.5
+    match[np.isin(rows, exact, assume_unique=True)] = 1.0
+    return match
+
+
+def _score_candidates(loaded: RestaurantDataset, result_rows: np.ndarray, dish_terms: Tuple[str, ...],
+                      dish_phrase: str, weights: ScoringWeights, target_cost: Optional[int] = None,
+                      near: Optional[Tuple[np.ndarray, np.ndarray, float]] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Score the matching, deduplicated rows on the numeric columns.
+    
+    For radius searches, near holds the sorted rows within the radius,
+    their distances in km and the radius.
+    
+    Returns:
+        The scores, votes and distances (None outside radius searches) of
+        the rows, aligned with them
+    """
+    data = loaded.table
+    
+    distances = closeness = None
+    if near is not None:
+        near_rows, near_distances, radius_km = near
+        distances = near_distances[np.searchsorted(near_rows, result_rows)]
+        closeness = 1.0 - distances / radius_km
+    
+    votes = data['votes'][result_rows]
+    match = _match_exactness(loaded, result_rows, dish_terms, dish_phrase) if weights.match else None
+    scores = score_rows(
+        weights,
+        match,
+        data['rating'][result_rows],
+        votes,
+        data['average_cost_for_two'][result_rows],
+        target_cost,
+        closeness,
+    )
+    return scores, votes, distances
+
+
+def _result_rows(loaded: RestaurantDataset, result_rows: np.ndarray, winners: np.ndarray,
+                 distances: Optional[np.ndarray]) -> ResultRows:
+    """
+    The winners, rendered from their pre-serialized records when the
+    response is written; distances are aligned with result_rows.
+    """
+    winner_distances = None
+    if distances is not None:
+        positions = np.searchsorted(result_rows, winners)
+        winner_distances = [round(distance, 2) for distance in distances[positions].tolist()]
+    return ResultRows(loaded.fragments, np.asarray(winners).tolist(), winner_distances)
+
+
+def _rank_rows(loaded: RestaurantDataset, result_rows: np.ndarray, dish_terms: Tuple[str, ...],
+               dish_phrase: str, top_n: int, weights: ScoringWeights, target_cost: Optional[int] = None,
+               near: Optional[Tuple[np.ndarray, np.ndarray, float]] = None) -> ResultRows:
+    """
+    Rank the matching, deduplicated rows and return the top results.
+    
+    Radius searches pass near as for _score_candidates; results then carry
+    distance_km.
+    """
+    scores, votes, distances = _score_candidates(
+        loaded, result_rows, dish_terms, dish_phrase, weights, target_cost, near
+    )
+    winners = top_k(result_rows, scores, votes, top_n)
+    return _result_rows(loaded, result_rows, winners, distances)
+
+
+def _unique_restaurants(loaded: RestaurantDataset, rows: np.ndarray) -> np.ndarray:
+    """Get unique restaurants, keeping the first occurrence"""
+    return dedupe_rows(rows, loaded.table['dedupe_key'])
+
+
+def _search(plan: QueryPlan, tiers: Sequence[RelaxationTier], top_n: int, weights: ScoringWeights,
+            target_cost: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Answer a planned query from its tightest non-empty tier.
+    
+    Returns:
+        The top results, the tier that answered and the highlight tag
+        counts over every restaurant found
+    """
+    location = ', '.join(plan.location_terms)
+    result_rows, tier = run_plan(plan, tiers)
+    if tier is None:
+        logger.warning(f"No restaurants found serving '{' '.join(plan.dish_terms)}' in {location}")
+        return {"results": ResultRows(plan.loaded.fragments, []), "tier": None, "highlights": {}}
+    
+    if tier != tiers[0].name:
+        logger.info(f"No exact match in {location}, relaxed to the {tier} tier")
+    logger.info(f"Found {len(result_rows)} restaurants serving '{' '.join(plan.dish_terms)}'")
+    result_rows = _unique_restaurants(plan.loaded, result_rows)
+    return {
+        "results": _rank_rows(
+            plan.loaded, result_rows, plan.dish_terms, plan.dish_phrase, top_n, weights, target_cost
+        ),
+        "tier": tier,
+        "highlights": plan.loaded.highlight_index.counts(result_rows),
+    }
+
+
+def correct_query(loaded: RestaurantDataset, dish_terms: Tuple[str, ...], location_terms: Tuple[str, ...]
+                  ) -> Tuple[Tuple[str, ...], Tuple[str, ...], List[Dict[str, Any]]]:
+    """
+    Replace dish tokens and location terms that match nothing with their
+    closest known spelling.
+    
+    Returns:
+        The corrected dish and location terms, and one entry per
+        correction with the term, its replacement and other suggestions
+    """
+    corrections = []
+    
+    def correct(field: str, term: str, spelling) -> str:
+        suggestions = spelling.lookup(term)
+        if not suggestions:
+            return term
+        corrections.append({"field": field, "term": term, "corrected": suggestions[0], "suggestions": suggestions})
+        return suggestions[0]
+    
+    corrected_dish = set()
+    for term in dish_terms:
+        tokens = []
+        for token in term.split():
+            lo, hi = loaded.dish_index.prefix_range(token)
+            tokens.append(token if lo < hi else correct("dish", token, loaded.dish_spelling))
+        corrected_dish.add(" ".join(tokens))
+    
+    corrected_location = []
+    for term in location_terms:
+        rows, _ = loaded.location_index.resolve_term(term)
+        corrected_location.append(term if len(rows) else correct("location", term, loaded.place_spelling))
+    
+    return tuple(sorted(corrected_dish)), tuple(corrected_location), corrections
+
+
+def _corrected_phrase(dish_phrase: str, corrections: List[Dict[str, Any]]) -> str:
+    """Apply the dish corrections of correct_query to the dish phrase"""
+    replacements = {c["term"]: c["corrected"] for c in corrections if c["field"] == "dish"}
+    return " ".join(replacements.get(token, token) for token in dish_phrase.split())
+
+
+def _corrected_plan(plan: QueryPlan) -> Tuple[QueryPlan, Optional[Dict[str, Any]]]:
+    """Return the plan of the spell-corrected query and its did_you_mean, or the plan and None"""
+    dish_terms, location_terms, corrections = correct_query(plan.loaded, plan.dish_terms, plan.location_terms)
+    if not corrections:
+        return plan, None
+    logger.info(f"Corrected query to '{' '.join(dish_terms)}' in '{', '.join(location_terms)}'")
+    did_you_mean = {
+        "dish": " ".join(dish_terms),
+        "location": ", ".join(location_terms),
+        "corrections": corrections,
+    }
+    dish_phrase = _corrected_phrase(plan.dish_phrase, corrections)
+    if location_terms == plan.location_terms:
+        return plan.for_dish(dish_terms, dish_phrase), did_you_mean
+    return QueryPlan(plan.loaded, dish_terms, location_terms, dish_phrase, plan.filters), did_you_mean
+
+
+def _near_candidates(plan: QueryPlan, latitude: float, longitude: float, radius_km: float
+                     ) -> Tuple[np.ndarray, QueryPlan, Tuple[np.ndarray, np.ndarray, float], Optional[Dict[str, Any]]]:
+    """
+    Find the deduplicated rows within radius_km of a point serving the
+    plan's dish, correcting the dish when it is misspelled.
+    
+    Returns:
+        The rows, the corrected plan, the rows within the radius with their
+        distances and the radius, and did_you_mean
+    """
+    loaded = plan.loaded
+    corrected, _, corrections = correct_query(loaded, plan.dish_terms, ())
+    did_you_mean = {"dish": " ".join(corrected), "corrections": corrections} if corrections else None
+    if corrections:
+        plan = plan.for_dish(corrected, _corrected_phrase(plan.dish_phrase, corrections))
+    
+    near = loaded.geo_index.within(latitude, longitude, radius_km)
+    result_rows = np.intersect1d(near[0], plan.candidates(0), assume_unique=True)
+    logger.info(f"Found {len(result_rows)} of {len(near[0])} nearby restaurants serving '{' '.join(corrected)}'")
+    return _unique_restaurants(loaded, result_rows), plan, (*near, radius_km), did_you_mean
+
+
+def _cached_search(plan: QueryPlan, top_n: int, rank_by: str, target_cost: Optional[int],
+                   relax: bool) -> Tuple[Dict[str, Any], bool]:
+    """
+    Run a planned query through the result cache.
+    
+    Relaxed queries are also spell-corrected first; the correction is
+    reported as did_you_mean.
+    
+    Returns:
+        The outcome of _search with did_you_mean, and whether it came from
+        the cache
+    """
+    version = plan.loaded.version
+    key = (plan.key, top_n, rank_by, target_cost, relax)
+    outcome = search_cache.get(key, version)
+    if outcome is not None:
+        logger.info("Serving search results from cache")
+        return outcome, True
+    
+    did_you_mean = None
+    if relax:
+        plan, did_you_mean = _corrected_plan(plan)
+    
+    tiers = RELAXATION_TIERS if relax else STRICT_TIERS
+    outcome = _search(plan, tiers, top_n, SCORING_PROFILES[rank_by], target_cost)
+    outcome["did_you_mean"] = did_you_mean
+    search_cache.put(key, version, outcome)
+    return outcome, False
+
+
+def find_restaurants_relaxed(dish: str, location: str, top_n: int = 10, rank_by: str = "rating",
+                             target_cost: Optional[int] = None,
+                             filters: Optional[SearchFilters] = None) -> Dict[str, Any]:
+    """
+    Find restaurants serving a dish, correcting misspellings and relaxing
+    the location when nothing matches.
+    
+    The full location is tried first, then only its first term (the city).
+    Both are evaluated in one pass; see search_planner.
+    
+    Returns:
+        results: The restaurants found
+        tier: The tier that answered ("location" or "city"), or None if no
+            tier had results
+        highlights: Highlight tag counts over every restaurant found
+        did_you_mean: The corrected query, or None if nothing was corrected
+    """
+    try:
+        loaded = load_dataset()
+        if loaded is None or loaded.empty:
+            logger.error("No data loaded")
+            return {"results": [], "tier": None, "highlights": {}, "did_you_mean": None}
+        
+        logger.info(f"Searching for '{dish}' in '{location}'")
+        plan = QueryPlan(loaded, *normalize_query(dish, location), filters=filters or SearchFilters())
+        outcome, _ = _cached_search(plan, top_n, rank_by, target_cost, relax=True)
+        logger.info(f"Returning {len(outcome['results'])} restaurants")
+        return outcome
+    
+    except Exception as e:
+        logger.error(f"Error in find_restaurants_relaxed: {str(e)}", exc_info=True)
+        return {"results": [], "tier": None, "highlights": {}, "did_you_mean": None}
+
+
+def find_restaurants(dish: str, location: str, top_n: int = 10, rank_by: str = "rating",
+                     target_cost: Optional[int] = None,
+                     filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
     """
     Find restaurants serving a specific dish in a given location.
     
+    Results are cached per normalized query for the loaded dataset version.
+    
     Args:
         dish: The dish or cuisine to search for
         location: The location to search in (can be city or specific area)
         top_n: Maximum number of results to return
+        rank_by: Scoring profile, one of SCORING_PROFILES
+        target_cost: Preferred average cost for two, used by profiles that weigh cost
+        filters: Ranges, highlights and opening time every result must meet
         
     Returns:
         List of restaurant dictionaries with complete details
     """
     try:
-        data = load_data()
-        if data is None or data.empty:
+        loaded = load_dataset()
+        if loaded is None or loaded.empty:
             logger.error("No data loaded")
             return []
             
         logger.info(f"Searching for '{dish}' in '{location}'")
         
-        # Convert to lowercase for case-insensitive search
-        dish_terms = [d.strip().lower() for d in dish.split() if d.strip()]
-        location_terms = [loc.strip().lower() for loc in location.split(',') if loc.strip()]
-        
-        # Filter by location
-        location_columns = ['location', 'locality', 'address']
-        location_columns = [col for col in location_columns if col in data.columns]
+        plan = QueryPlan(loaded, *normalize_query(dish, location), filters=filters or SearchFilters())
+        outcome, _ = _cached_search(plan, top_n, rank_by, target_cost, relax=False)
         
-        def create_location_string(row):
-            return ' '.join(str(row[col]).lower() for col in location_columns if col in row and pd.notna(row[col]))
-            
-        data['location_search'] = data.apply(create_location_string, axis=1)
+        logger.info(f"Returning {len(outcome['results'])} restaurants")
+        return outcome["results"].to_list()
         
-        location_filter = data['location_search'].apply(
-            lambda x: all(term in str(x).lower() for term in location_terms)
-        )
+    except Exception as e:
+        logger.error(f"Error in find_restaurants: {str(e)}", exc_info=True)
+        return []
+
+
+def find_restaurants_near(dish: str, latitude: float, longitude: float, radius_km: float = 3.0,
+                          top_n: int = 10, rank_by: str = "nearby",
+                          target_cost: Optional[int] = None,
+                          filters: Optional[SearchFilters] = None) -> Dict[str, Any]:
+    """
+    Find restaurants serving a dish within radius_km of a point.
+    
+    Only the grid cells around the point are read; see geo_index. Dish
+    misspellings are corrected as in find_restaurants_relaxed.
+    
+    Returns:
+        results: The restaurants found, each with its distance_km
+        highlights: Highlight tag counts over every restaurant found
+        did_you_mean: The corrected dish, or None if nothing was corrected
+    """
+    try:
+        loaded = load_dataset()
+        if loaded is None or loaded.empty:
+            logger.error("No data loaded")
+            return {"results": [], "highlights": {}, "did_you_mean": None}
         
-        filtered_df = data[location_filter].copy()
+        logger.info(f"Searching for '{dish}' within {radius_km} km of ({latitude}, {longitude})")
+        dish_terms, _, dish_phrase = normalize_query(dish, "")
+        plan = QueryPlan(loaded, dish_terms, (), dish_phrase, filters or SearchFilters())
+        key = ("near", plan.key, latitude, longitude, radius_km, top_n, rank_by, target_cost)
+        outcome = search_cache.get(key, loaded.version)
+        if outcome is None:
+            result_rows, plan, near, did_you_mean = _near_candidates(plan, latitude, longitude, radius_km)
+            restaurants = _rank_rows(
+                loaded, result_rows, plan.dish_terms, plan.dish_phrase, top_n, SCORING_PROFILES[rank_by],
+                target_cost, near
+            )
+            outcome = {
+                "results": restaurants,
+                "highlights": loaded.highlight_index.counts(result_rows),
+                "did_you_mean": did_you_mean,
+            }
+            search_cache.put(key, loaded.version, outcome)
         
-        if filtered_df.empty:
-            logger.warning(f"No restaurants found in location: {location}")
-            return []
-            
-        logger.info(f"Found {len(filtered_df)} restaurants in location")
+        logger.info(f"Returning {len(outcome['results'])} restaurants")
+        return outcome
+    
+    except Exception as e:
+        logger.error(f"Error in find_restaurants_near: {str(e)}", exc_info=True)
+        return {"results": [], "highlights": {}, "did_you_mean": None}
+
+
+def _rank_search(loaded: RestaurantDataset, dish: str, location: str, rank_by: str,
+                 target_cost: Optional[int], filters: Optional[SearchFilters],
+                 point: Optional[Tuple[float, float, float]]) -> Dict[str, Any]:
+    """
+    Find and score every restaurant a /search query matches, as
+    find_restaurants_relaxed, or find_restaurants_near when point holds a
+    latitude, longitude and radius_km, would.
+    
+    Returns:
+        rows, scores, votes and distances (None outside radius searches),
+        aligned with the sorted rows, plus the tier and did_you_mean
+    """
+    filters = filters or SearchFilters()
+    if point is not None:
+        dish_terms, _, dish_phrase = normalize_query(dish, "")
+        rows, plan, near, did_you_mean = _near_candidates(
+            QueryPlan(loaded, dish_terms, (), dish_phrase, filters), *point
+        )
+        tier = None
+    else:
+        plan, did_you_mean = _corrected_plan(QueryPlan(loaded, *normalize_query(dish, location), filters=filters))
+        rows, tier = run_plan(plan, RELAXATION_TIERS)
+        rows, near = _unique_restaurants(loaded, rows), None
+    scores, votes, distances = _score_candidates(
+        loaded, rows, plan.dish_terms, plan.dish_phrase, SCORING_PROFILES[rank_by], target_cost, near
+    )
+    return {
+        "rows": rows, "scores": scores, "votes": votes, "distances": distances,
+        "tier": tier, "did_you_mean": did_you_mean,
+    }
+
+
+def _drop_through(ranked: Dict[str, Any], score: float, vote: int, row: int) -> Dict[str, Any]:
+    """Keep only the ranked rows that come after (score, vote, row)"""
+    keep = ranked_after(ranked["rows"], ranked["scores"], ranked["votes"], score, vote, row)
+    distances = ranked["distances"]
+    return {
+        **ranked,
+        "rows": ranked["rows"][keep],
+        "scores": ranked["scores"][keep],
+        "votes": ranked["votes"][keep],
+        "distances": None if distances is None else distances[keep],
+    }
+
+
+def find_restaurants_paged(dish: str, location: str = "", page_size: int = 10, cursor: Optional[str] = None,
+                          rank_by: str = "rating", target_cost: Optional[int] = None,
+                          filters: Optional[SearchFilters] = None,
+                          point: Optional[Tuple[float, float, float]] = None) -> Dict[str, Any]:
+    """
+    Return one page of a search's results, in ranking order.
+    
+    The search is that of find_restaurants_relaxed, or of
+    find_restaurants_near when point holds a latitude, longitude and
+    radius_km. The cursor of a page holds the score and row id of its last
+    result, so the next page starts right after it however the pages are
+    sized.
+    
+    Raises:
+        ValueError: If the cursor is malformed or from an older dataset
+    
+    Returns:
+        results: The restaurants of the page
+        next_cursor: Cursor of the next page, or None on the last page
+        tier: The tier that answered, or None
+        did_you_mean: The corrected query, or None if nothing was corrected
+    """
+    empty = {"results": [], "next_cursor": None, "tier": None, "did_you_mean": None}
+    loaded = load_dataset()
+    if loaded is None or loaded.empty:
+        logger.error("No data loaded")
+        return empty
+    after = decode_cursor(cursor, loaded.version) if cursor else None
+    if after is not None and not 0 <= after[1] < len(loaded.table):
+        raise ValueError("Malformed cursor")
+    
+    try:
+        ranked = _rank_search(loaded, dish, location, rank_by, target_cost, filters, point)
+        if after is not None:
+            score, row = after
+            ranked = _drop_through(ranked, score, int(loaded.table['votes'][row]), row)
         
-        # Filter by dish
-        dish_columns = ['cuisines', 'restaurant_name']
-        dish_columns = [col for col in dish_columns if col in filtered_df.columns]
+        rows, scores, votes = ranked["rows"], ranked["scores"], ranked["votes"]
+        winners = top_k(rows, scores, votes, page_size + 1)
+        next_cursor = None
+        if len(winners) > page_size:
+            winners = winners[:page_size]
+            last = int(np.searchsorted(rows, winners[-1]))
+            next_cursor = encode_cursor(float(scores[last]), int(winners[-1]), loaded.version)
         
-        def create_search_string(row):
-            return ' '.join(str(row[col]).lower() for col in dish_columns if col in row and pd.notna(row[col]))
-            
-        filtered_df['search_string'] = filtered_df.apply(create_search_string, axis=1)
+        logger.info(f"Returning a page of {len(winners)} of {len(rows)} remaining restaurants")
+        return {
+            "results": _result_rows(loaded, rows, winners, ranked["distances"]),
+            "next_cursor": next_cursor,
+            "tier": ranked["tier"],
+            "did_you_mean": ranked["did_you_mean"],
+        }
+    
+    except Exception as e:
+        logger.error(f"Error in find_restaurants_paged: {str(e)}", exc_info=True)
+        return empty
+
+
+def stream_restaurants(dish: str, location: str = "", rank_by: str = "rating",
+                       target_cost: Optional[int] = None, filters: Optional[SearchFilters] = None,
+                       point: Optional[Tuple[float, float, float]] = None,
+                       batch_size: int = SEARCH_STREAM_BATCH) -> Iterator[bytes]:
+    """
+    Return every result of a search as NDJSON, one restaurant per line, in
+    ranking order.
+    
+    Candidates are found, scored and sorted into ranking order before this
+    returns, so all the search work runs on the caller's search worker. The
+    returned iterator only slices the ranking and renders batch_size results
+    at a time as the response is written, so the whole response is never
+    materialized.
+    """
+    try:
+        loaded = load_dataset()
+        if loaded is None or loaded.empty:
+            logger.error("No data loaded")
+            return iter(())
+        ranked = _rank_search(loaded, dish, location, rank_by, target_cost, filters, point)
+        order = rank_order(ranked["rows"], ranked["scores"], ranked["votes"])
+        distances = ranked["distances"]
+        logger.info(f"Streaming {len(order)} restaurants")
+        return _stream_batches(
+            loaded, ranked["rows"][order], None if distances is None else distances[order], batch_size
+        )
+    
+    except Exception as e:
+        logger.error(f"Error in stream_restaurants: {str(e)}", exc_info=True)
+        return iter(())
+
+
+def _stream_batches(loaded: RestaurantDataset, rows: np.ndarray, distances: Optional[np.ndarray],
+                    batch_size: int) -> Iterator[bytes]:
+    """Yield rows already in ranking order batch by batch as NDJSON"""
+    for start in range(0, len(rows), batch_size):
+        end = start + batch_size
+        batch_distances = None
+        if distances is not None:
+            batch_distances = [round(distance, 2) for distance in distances[start:end].tolist()]
+        yield ResultRows(loaded.fragments, rows[start:end].tolist(), batch_distances).to_ndjson()
+
+
+def find_restaurants_batch(queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run many searches in one pass.
+    
+    Queries are grouped by normalized location so that each location is
+    resolved once for all the dishes searched in it.
+    
+    Args:
+        queries: Dicts with dish and location, and optionally top_n, rank_by,
+            target_cost and filters as accepted by find_restaurants, and relax
+            to search as find_restaurants_relaxed does
         
-        def dish_match(search_str):
-            search_str = str(search_str).lower()
-            return any(term in search_str for term in dish_terms)
+    Returns:
+        One entry per query, in input order, with its results, the tier
+        that answered and timing
+    """
+    loaded = load_dataset()
+    if loaded is None or loaded.empty:
+        logger.error("No data loaded")
+        return [{"dish": q["dish"], "location": q["location"], "results": [], "tier": None, "highlights": {},
+                 "did_you_mean": None, "cached": False, "elapsed_ms": 0.0} for q in queries]
+    
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    normalized = []
+    for index, query in enumerate(queries):
+        dish_terms, location_terms, dish_phrase = normalize_query(query["dish"], query["location"])
+        normalized.append((dish_terms, dish_phrase))
+        groups.setdefault(location_terms, []).append(index)
+    
+    responses: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    for location_terms, members in groups.items():
+        plan = QueryPlan(loaded, (), location_terms)
+        for index in members:
+            started = time.perf_counter()
+            query = queries[index]
+            # The location is resolved at most once, by the first query that misses the cache
+            plan = plan.for_dish(*normalized[index], query.get("filters") or SearchFilters())
+            outcome, cached = _cached_search(
+                plan,
+                query.get("top_n", 10),
+                query.get("rank_by") or "rating",
+                query.get("target_cost"),
+                bool(query.get("relax")),
+            )
             
-        dish_filter = filtered_df['search_string'].apply(dish_match)
-        results_df = filtered_df[dish_filter].copy()
-        
-        if results_df.empty:
-            logger.warning(f"No restaurants found serving '{dish}' in {location}")
-            return []
-        
-        logger.info(f"Found {len(results_df)} restaurants serving '{dish}'")
-        
-        # Get unique restaurants
-        results_df = results_df.drop_duplicates(subset=['restaurant_name', 'location'])
-        
-        # Convert to list of dictionaries
-        restaurants = []
-        for _, row in results_df.iterrows():
-            restaurant = {
-                'restaurant_name': row.get('restaurant_name', 'Unnamed Restaurant'),
-                'address': row.get('address', row.get('location', 'Address not available')),
-                'locality': row.get('locality', 'Locality not available'),
-                'city': row.get('city', row.get('location', 'City not available')),
-                'cuisines': row.get('cuisines', 'Cuisines not specified'),
-                'url': row.get('url', None),
-                'menu_url': row.get('menu_url', None),
-                'image_url': row.get('image_url', None),
-                'rating': float(row['rating']) if 'rating' in row and pd.notna(row['rating']) else 0.0,
-                'rating_text': row.get('rating_text', 'No rating'),
-                'votes': int(row['votes']) if 'votes' in row and pd.notna(row['votes']) else 0,
-                'average_cost_for_two': int(row['average_cost_for_two']) if 'average_cost_for_two' in row and pd.notna(row['average_cost_for_two']) else 0,
+            responses[index] = {
+                "dish": query["dish"],
+                "location": query["location"],
+                **outcome,
+                "cached": cached,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
             }
-            restaurants.append(restaurant)
-        
-        # Sort by rating and limit results
-        restaurants.sort(key=lambda x: x['rating'], reverse=True)
-        restaurants = restaurants[:top_n]
-        
-        logger.info(f"Returning {len(restaurants)} restaurants")
-        return restaurants
-        
-    except Exception as e:
-        logger.error(f"Error in find_restaurants: {str(e)}", exc_info=True)
-        return []
+    
+    logger.info(f"Batch searched {len(queries)} queries across {len(groups)} locations")
+    return responses
+
+
+def search_stats() -> Dict[str, Any]:
+    """Return search result cache and timings parsing statistics"""
+    stats = {"cache": search_cache.stats()}
+    if dataset is not None:
+        stats["timings"] = dataset.opening_hours.stats()
+    return stats
@@ -0,0 +1,224 @@
+"""
+Read-only columnar restaurant table
+
+Numeric columns are plain NumPy arrays and text columns are stored as one
+UTF-8 byte buffer plus row offsets, or, when their values repeat enough
+for it to be smaller, as a small integer code per row into the distinct
+values. All of them can be backed by memory-mapped snapshot files, so
+every worker process reads the same physical pages instead of holding its
+own copy of the dataset.
+"""
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class StringColumn:
+    """Variable-length UTF-8 strings stored as a byte buffer plus offsets"""
+
+    __slots__ = ("buffer", "offsets")
+
+    def __init__(self, buffer, offsets: np.ndarray):
+        # buffer is bytes or a read-only mmap; offsets has len(column) + 1 entries
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> "StringColumn":
+        """Build a column from Python values, storing missing values as ''"""
+        encoded = [v.encode("utf-8") if isinstance(v, str) else b"" for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.buffer[start:end].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def factorize(self) -> Tuple[np.ndarray, List[str]]:
+        """A code per row into the distinct values, and those values"""
+        codes, uniques = pd.factorize(np.array(list(self), dtype=object))
+        return codes, [str(u) for u in uniques]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class CategoryColumn:
+    """
+    Dictionary-encoded strings: a code per row into the distinct values.
+
+    The distinct values are decoded and interned once, so every row with
+    the same value returns the same str object without decoding.
+    """
+
+    __slots__ = ("codes", "categories", "_values")
+
+    def __init__(self, codes: np.ndarray, categories: StringColumn):
+        self.codes = codes
+        self.categories = categories
+        self._values = [sys.intern(value) for value in categories]
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> "CategoryColumn":
+        """Build a column from Python values, storing missing values as ''"""
+        positions: Dict[str, int] = {}
+        codes = [positions.setdefault(v if isinstance(v, str) else "", len(positions)) for v in values]
+        return cls(np.array(codes, dtype=_code_dtype(len(positions))), StringColumn.from_values(list(positions)))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self._values[self.codes[row]]
+
+    def __iter__(self) -> Iterator[str]:
+        values = self._values
+        for code in self.codes.tolist():
+            yield values[code]
+
+    def factorize(self) -> Tuple[np.ndarray, List[str]]:
+        """A code per row into the distinct values, and those values"""
+        return self.codes, self._values
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.categories.nbytes
+
+
+def _code_dtype(count: int) -> np.dtype:
+    """Smallest unsigned integer type holding count distinct codes"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if count <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+TextColumn = Union[StringColumn, CategoryColumn]
+Column = Union[np.ndarray, StringColumn, CategoryColumn]
+
+
+def text_column(values: pd.Series) -> Union[StringColumn, CategoryColumn]:
+    """
+    Store cleaned text values dictionary-encoded when that takes fewer
+    bytes.
+
+    Values are factorized once; both layouts are then built from the
+    distinct values' byte lengths and one encode of the joined text rather
+    than per-row work.
+    """
+    codes, uniques = pd.factorize(values.fillna(""))
+    uniques = [str(u) for u in uniques]
+    lengths = np.fromiter((len(u.encode("utf-8")) for u in uniques), dtype=np.int64, count=len(uniques))
+    code_dtype = _code_dtype(len(uniques))
+    plain_bytes = int(lengths[codes].sum()) + 8 * (len(codes) + 1)
+    encoded_bytes = int(lengths.sum()) + 8 * (len(uniques) + 1) + code_dtype.itemsize * len(codes)
+    if encoded_bytes < plain_bytes:
+        return CategoryColumn(codes.astype(code_dtype), StringColumn.from_values(uniques))
+
+    offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(lengths[codes], out=offsets[1:])
+    return StringColumn("".join(np.asarray(uniques, dtype=object)[codes]).encode("utf-8"), offsets)
+
+
+class RestaurantTable:
+    """Immutable set of equally long named columns"""
+
+    def __init__(self, columns: Dict[str, Column], version: str = ""):
+        lengths = {len(col) for col in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self._columns = dict(columns)
+        self._length = lengths.pop() if lengths else 0
+        self.version = version
+
+    @classmethod
+    def from_frame(cls, frame, version: str = "") -> "RestaurantTable":
+        """Build an in-memory table from a normalized pandas DataFrame"""
+        columns = {}
+        for name in frame.columns:
+            series = frame[name]
+            if series.dtype.kind in "biuf":
+                columns[name] = np.ascontiguousarray(series.to_numpy())
+            else:
+                columns[name] = text_column(series)
+        return cls(columns, version)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getitem__(self, name: str) -> Column:
+        return self._columns[name]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def empty(self) -> bool:
+        return self._length == 0
+
+    def without(self, names: Iterable[str]) -> "RestaurantTable":
+        """The same table minus the named columns"""
+        dropped = set(names)
+        return RestaurantTable({k: v for k, v in self._columns.items() if k not in dropped}, self.version)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes used by each column"""
+        return {name: col.nbytes for name, col in self._columns.items()}
+
+
+def process_memory(mapped_prefix: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Report this process's unique vs shared resident memory in bytes.
+
+    Reads /proc/self/smaps, so it is only available on Linux. When
+    mapped_prefix is given, the resident size of mappings under that path
+    (the memory-mapped dataset snapshot) is reported separately.
+    """
+    smaps_path = "/proc/self/smaps"
+    if not os.path.exists(smaps_path):
+        return {"pid": os.getpid(), "available": False}
+
+    totals = {"rss": 0, "pss": 0, "shared": 0, "private": 0, "dataset_rss": 0}
+    fields = {
+        "Rss:": "rss",
+        "Pss:": "pss",
+        "Shared_Clean:": "shared",
+        "Shared_Dirty:": "shared",
+        "Private_Clean:": "private",
+        "Private_Dirty:": "private",
+    }
+    in_dataset = False
+    with open(smaps_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            key = parts[0]
+            if not key.endswith(":"):
+                # Mapping header: "start-end perms offset dev inode [path]"
+                path = parts[5] if len(parts) > 5 else ""
+                in_dataset = bool(mapped_prefix) and path.startswith(mapped_prefix)
+                continue
+            if key in fields:
+                size = int(parts[1]) * 1024
+                totals[fields[key]] += size
+                if key == "Rss:" and in_dataset:
+                    totals["dataset_rss"] += size
+
+    return {"pid": os.getpid(), "available": True, **totals}
@@ -2,14 +2,44 @@
 Main application routes (home, profile, etc.)
 """
 from fastapi import APIRouter, Request, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from typing import Any, Dict, List, Optional
+import hmac
 import logging
-import pandas as pd
+import time
 
 from ..auth_utils import get_current_user
-from ..models import User
-from ..restaurant_service import find_restaurants, load_data
+from ..config import (
+    ADMIN_TOKEN,
+    DATASET_SNAPSHOT_DIR,
+    SEARCH_BATCH_MAX_QUERIES,
+    SEARCH_MAX_RADIUS_KM,
+    SEARCH_PAGE_MAX_SIZE,
+    SUGGEST_MAX_LIMIT,
+    TIMINGS_UTC_OFFSET_MINUTES,
+)
+from ..dataset_watcher import dataset_watcher
+from ..models import BatchSearchRequest, User
+from ..opening_hours import current_week_minute, parse_week_minute
+from ..range_index import parse_ranges
+from ..ranking import SCORING_PROFILES
+from ..record_fragments import encode_json
+from ..restaurant_service import (
+    find_restaurants_batch,
+    find_restaurants_near,
+    find_restaurants_paged,
+    find_restaurants_relaxed,
+    load_data,
+    load_dataset,
+    normalize_query,
+    search_stats,
+    stream_restaurants,
+)
+from ..restaurant_table import process_memory
+from ..search_executor import SearchQueueFull, search_executor
+from ..search_planner import SearchFilters
+from ..suggest_index import Suggestions
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -49,101 +79,324 @@ async def profile_page(request: Request, current_user: User = Depends(get_curren
     return templates.TemplateResponse("profile.html", {"request": request, "user": current_user})
 
 
+def _busy_response() -> JSONResponse:
+    """503 returned when the search pool cannot take more work"""
+    return JSONResponse(
+        {"success": False, "error": "Search is busy, please try again shortly"},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+def _json_response(payload: dict) -> Response:
+    """Search response with its results spliced in from pre-serialized records"""
+    return Response(encode_json(payload), media_type="application/json")
+
+
+def _search_filters(bounds: dict, require: List[str], exclude: List[str],
+                    open_at: str, open_now: bool) -> SearchFilters:
+    """
+    Build search filters from request fields.
+
+    Raises:
+        ValueError: If open_at is not a weekday and time
+    """
+    week_minute = None
+    if open_now:
+        week_minute = current_week_minute(TIMINGS_UTC_OFFSET_MINUTES)
+    elif open_at.strip():
+        week_minute = parse_week_minute(open_at)
+        if week_minute is None:
+            raise ValueError(f"open_at must be a weekday and time such as 'Fri 19:30', got '{open_at}'")
+    return SearchFilters.create(
+        parse_ranges(bounds),
+        [tag for tag in require if tag.strip()],
+        [tag for tag in exclude if tag.strip()],
+        week_minute,
+    )
+
+
 @router.post("/search")
-async def search_restaurants(dish: str = Form(...), location: str = Form(...)):
-    """Search for restaurants"""
+async def search_restaurants(
+    dish: str = Form(...),
+    location: str = Form(""),
+    rank_by: Optional[str] = Form(None),
+    target_cost: Optional[int] = Form(None),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
+    radius_km: float = Form(3.0),
+    min_rating: Optional[float] = Form(None),
+    max_rating: Optional[float] = Form(None),
+    min_cost: Optional[int] = Form(None),
+    max_cost: Optional[int] = Form(None),
+    min_votes: Optional[int] = Form(None),
+    max_votes: Optional[int] = Form(None),
+    require: str = Form(""),
+    exclude: str = Form(""),
+    open_at: str = Form(""),
+    open_now: bool = Form(False),
+    page_size: Optional[int] = Form(None),
+    cursor: str = Form(""),
+    stream: bool = Form(False),
+):
+    """
+    Search for restaurants in a location, or near a point when latitude and
+    longitude are given. require and exclude are comma separated highlights;
+    open_at is a weekday and time such as "Fri 19:30".
+
+    With page_size or cursor, returns one page and the next_cursor; with
+    stream, every result as NDJSON.
+    """
+    near_me = latitude is not None and longitude is not None
+    rank_by = rank_by or ("nearby" if near_me else "rating")
+    if rank_by not in SCORING_PROFILES:
+        return JSONResponse(
+            {"success": False, "error": f"rank_by must be one of: {', '.join(SCORING_PROFILES)}"},
+            status_code=400,
+        )
+    if near_me:
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius_km <= SEARCH_MAX_RADIUS_KM):
+            return JSONResponse(
+                {"success": False, "error": f"Invalid coordinates or radius (at most {SEARCH_MAX_RADIUS_KM} km)"},
+                status_code=400,
+            )
+    elif not location.strip():
+        return JSONResponse(
+            {"success": False, "error": "Give a location, or latitude and longitude"},
+            status_code=400,
+        )
     try:
-        # First try exact match
-        results = find_restaurants(dish, location)
-        
-        # If no results, try a more flexible search
-        if not results:
-            data = load_data()
-            if data is not None and not data.empty:
-                # Try matching just the city if full location didn't work
-                city = location.split(',')[0].strip()
-                if city != location:
-                    results = find_restaurants(dish, city)
-        
-        return {"success": True, "results": results}
+        filters = _search_filters(
+            {
+                "min_rating": min_rating, "max_rating": max_rating,
+                "min_cost": min_cost, "max_cost": max_cost,
+                "min_votes": min_votes, "max_votes": max_votes,
+            },
+            require.split(","),
+            exclude.split(","),
+            open_at,
+            open_now,
+        )
+    except ValueError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+    options = {"rank_by": rank_by, "target_cost": target_cost, "filters": filters}
+    point = (latitude, longitude, radius_km) if near_me else None
+    if stream:
+        try:
+            lines = await search_executor.run(stream_restaurants, dish, location, point=point, **options)
+        except SearchQueueFull:
+            return _busy_response()
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    if page_size is not None or cursor:
+        page_size = 10 if page_size is None else page_size
+        if not 1 <= page_size <= SEARCH_PAGE_MAX_SIZE:
+            return JSONResponse(
+                {"success": False, "error": f"page_size must be between 1 and {SEARCH_PAGE_MAX_SIZE}"},
+                status_code=400,
+            )
+        try:
+            outcome = await search_executor.run(
+                find_restaurants_paged, dish, location, page_size, cursor, point=point, **options
+            )
+        except SearchQueueFull:
+            return _busy_response()
+        except ValueError as e:
+            return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+        return _json_response({"success": True, **outcome})
+    # Identical searches arriving together share one run; see search_executor
+    if near_me:
+        key = ("near", normalize_query(dish, ""), latitude, longitude, radius_km, rank_by, target_cost, filters)
+    else:
+        key = ("relaxed", normalize_query(dish, location), rank_by, target_cost, filters)
+    try:
+        if near_me:
+            outcome = await search_executor.run_shared(
+                key, find_restaurants_near, dish, latitude, longitude, radius_km, **options
+            )
+        else:
+            # Corrects misspellings and falls back to the city when nothing
+            # matches the full location
+            outcome = await search_executor.run_shared(key, find_restaurants_relaxed, dish, location, **options)
+        return _json_response({"success": True, **outcome})
+    except SearchQueueFull:
+        return _busy_response()
     except Exception as e:
         logger.error(f"Error in search: {str(e)}", exc_info=True)
         return {"success": False, "error": str(e)}
 
 
+@router.post("/search/batch")
+async def search_restaurants_batch(batch: BatchSearchRequest):
+    """Search many dish/location pairs in one request"""
+    if len(batch.queries) > SEARCH_BATCH_MAX_QUERIES:
+        return JSONResponse(
+            {"success": False, "error": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch"},
+            status_code=400,
+        )
+    invalid = [i for i, query in enumerate(batch.queries) if query.rank_by not in SCORING_PROFILES]
+    if invalid:
+        return JSONResponse(
+            {"success": False, "error": f"Unknown rank_by in queries {invalid}"},
+            status_code=400,
+        )
+    blank = [i for i, query in enumerate(batch.queries) if not query.location.strip()]
+    if blank:
+        return JSONResponse(
+            {"success": False, "error": f"Give a location in queries {blank}"},
+            status_code=400,
+        )
+    try:
+        queries = [
+            {**dict(query), "filters": _search_filters(
+                dict(query), query.require, query.exclude, query.open_at or "", query.open_now
+            )}
+            for query in batch.queries
+        ]
+    except ValueError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+    try:
+        started = time.perf_counter()
+        results = await search_executor.run(find_restaurants_batch, queries)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        return _json_response({"success": True, "results": results, "elapsed_ms": elapsed_ms})
+    except SearchQueueFull:
+        return _busy_response()
+    except Exception as e:
+        logger.error(f"Error in batch search: {str(e)}", exc_info=True)
+        return {"success": False, "error": str(e)}
+
+
+def _versioned_response(request: Request, payload: dict, version: str) -> Response:
+    """
+    Return payload tagged with the dataset version as its ETag.
+
+    Browsers revalidate on every visit (no-cache) and get an empty 304
+    while the dataset is unchanged.
+    """
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = [tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in if_none_match.split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
 @router.get("/api/cities")
-async def get_cities():
+async def get_cities(request: Request):
     """Get list of all available cities"""
     try:
-        df = load_data()
-        if df is None or df.empty:
+        dataset = await search_executor.run(load_dataset)
+        if dataset is None or dataset.empty:
             return {"error": "No data available"}
         
-        # Get unique cities, sort them, and remove any NaN/None values
-        cities = sorted(set(loc.split(',')[0].strip() for loc in df['location'].dropna().astype(str) if loc))
-        return {"cities": cities}
+        return _versioned_response(request, {"cities": dataset.facets.cities}, dataset.version)
+    except SearchQueueFull:
+        return _busy_response()
     except Exception as e:
         logger.error(f"Error getting cities: {str(e)}")
         return {"error": str(e)}
 
 
 @router.get("/api/sublocations")
-async def get_sublocations(city: str):
+async def get_sublocations(request: Request, city: str):
     """Get sub-locations for a given city"""
     try:
-        df = load_data()
-        if df is None or df.empty:
+        dataset = await search_executor.run(load_dataset)
+        if dataset is None or dataset.empty:
             return {"sublocations": []}
         
-        city_lower = city.lower()
-        sublocations = set()
-        
-        # Get localities from the 'locality' column
-        if 'locality' in df.columns:
-            city_matches = df[df['location'].str.lower().str.contains(city_lower, na=False)]
-            localities = city_matches['locality'].dropna().unique()
-            
-            for loc in localities:
-                if pd.notna(loc) and str(loc).strip() and str(loc).lower() != city_lower:
-                    sublocations.add(str(loc).strip())
-        
-        # Convert to list and sort
-        sublocations = sorted(list(sublocations), key=lambda x: x.lower())
-        
-        # Add 'All Areas' as the first option
-        sublocations = ["All Areas"] + sublocations
-        
-        return {"sublocations": sublocations}
+        sublocations = dataset.facets.sublocations_for(city)
+        return _versioned_response(request, {"sublocations": sublocations}, dataset.version)
         
+    except SearchQueueFull:
+        return _busy_response()
     except Exception as e:
         logger.error(f"Error getting sub-locations: {str(e)}", exc_info=True)
         return {"error": str(e)}
 
 
 @router.get("/api/dishes")
-async def get_dishes(city: str = None, sublocation: str = None):
+async def get_dishes(request: Request, city: str = None, sublocation: str = None):
     """Get list of all available dishes, optionally filtered by city and sub-location"""
     try:
-        df = load_data()
-        if df is None or df.empty:
+        dataset = await search_executor.run(load_dataset)
+        if dataset is None or dataset.empty:
             return {"error": "No data available"}
         
-        # Filter by city and sub-location if provided
-        if city:
-            df = df[df['location'].str.lower().str.contains(city.lower(), na=False)]
-            if sublocation:
-                df = df[df['location'].str.lower().str.contains(sublocation.lower(), na=False)]
-        
-        # Extract all unique cuisines and dishes
-        all_dishes = set()
-        for cuisines in df['cuisines'].dropna():
-            # Split cuisines by comma and clean up
-            dishes = [dish.strip().lower() for dish in cuisines.split(',')]
-            all_dishes.update(dishes)
-        
-        # Sort dishes alphabetically
-        dishes = sorted(all_dishes)
-        return {"dishes": dishes}
+        dishes = dataset.facets.dishes_for(city, sublocation)
+        return _versioned_response(request, {"dishes": dishes}, dataset.version)
+    except SearchQueueFull:
+        return _busy_response()
     except Exception as e:
         logger.error(f"Error getting dishes: {str(e)}")
         return {"error": str(e)}
+
+
+@router.get("/api/suggest")
+async def get_suggestions(request: Request, field: str, prefix: str = "", limit: int = 8, city: str = None):
+    """Autocomplete a dish, city or locality prefix, most popular first"""
+    if field not in Suggestions.FIELDS:
+        return JSONResponse(
+            {"error": f"field must be one of: {', '.join(Suggestions.FIELDS)}"},
+            status_code=400,
+        )
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+    try:
+        dataset = await search_executor.run(load_dataset)
+        if dataset is None or dataset.empty:
+            return {"error": "No data available"}
+        
+        suggestions = dataset.suggestions.suggest(field, prefix, limit, city)
+        return _versioned_response(request, {"suggestions": suggestions}, dataset.version)
+    except SearchQueueFull:
+        return _busy_response()
+    except Exception as e:
+        logger.error(f"Error getting suggestions: {str(e)}")
+        return {"error": str(e)}
+
+
+@router.post("/api/admin/reload-dataset")
+async def reload_dataset_now(request: Request, force: bool = False):
+    """
+    Rebuild the dataset from its CSV in the background and swap it in.
+
+    Requires the X-Admin-Token header to match ADMIN_TOKEN. The other
+    workers pick the request up through the snapshot directory. Progress is
+    reported under reload in /api/stats/memory.
+    """
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return JSONResponse({"success": False, "error": "Not allowed"}, status_code=403)
+    dataset_watcher.trigger(force=force)
+    return JSONResponse({"success": True, "message": "Dataset reload scheduled"}, status_code=202)
+
+
+def _memory_stats() -> Dict[str, Any]:
+    """Memory and dataset statistics; may load the dataset and reads /proc"""
+    df = load_data()
+    stats = process_memory(mapped_prefix=DATASET_SNAPSHOT_DIR)
+    if df is not None:
+        stats["dataset_version"] = df.version
+        stats["dataset_columns"] = df.memory_usage()
+        stats["dataset_bytes"] = sum(stats["dataset_columns"].values())
+    stats["reload"] = dataset_watcher.stats()
+    return stats
+
+
+@router.get("/api/stats/memory")
+async def get_memory_stats():
+    """Report this worker's unique vs shared memory and the dataset mapping"""
+    try:
+        return await search_executor.run(_memory_stats)
+    except SearchQueueFull:
+        return _busy_response()
+    except Exception as e:
+        logger.error(f"Error getting memory stats: {str(e)}")
+        return {"error": str(e)}
+
+
+@router.get("/api/stats/search")
+async def get_search_stats():
+    """Report search result cache, worker pool and timings parsing statistics"""
+    return {**search_stats(), "executor": search_executor.stats()}
@@ -0,0 +1,104 @@
+"""
+Bounded cache of search results
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class SearchCache:
+    """
+    LRU cache with a time-to-live and frequency-aware admission.
+
+    Every lookup counts towards its key's frequency. When the cache is full,
+    a new entry is only admitted if its key has been asked for at least as
+    often as the least recently used entry it would evict, so a burst of
+    one-off queries cannot flush the popular ones. Frequencies are halved
+    periodically so that yesterday's popular queries fade out.
+
+    Entries belong to one dataset version; storing or looking up a result
+    for a different version drops everything cached for the old one.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._frequency: Dict[Hashable, int] = {}
+        self._frequency_events = 0
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._frequency.clear()
+            self._version = version
+
+    def _record(self, key: Hashable) -> None:
+        self._frequency[key] = self._frequency.get(key, 0) + 1
+        self._frequency_events += 1
+        if self._frequency_events >= 10 * max(self.max_entries, 1):
+            self._frequency = {k: n // 2 for k, n in self._frequency.items() if n > 1}
+            self._frequency_events = 0
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            self._check_version(version)
+            self._record(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, version: str, value: Any) -> None:
+        """Store value for key, subject to admission when the cache is full"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                victim = next(iter(self._entries))
+                if self._frequency.get(key, 0) < self._frequency.get(victim, 0):
+                    self.rejections += 1
+                    return
+                del self._entries[victim]
+                self.evictions += 1
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._frequency.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters describing cache effectiveness"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "rejections": self.rejections,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,122 @@
+"""
+Bounded worker pool for CPU-bound search work
+
+Route handlers are coroutines; running pandas/NumPy search work inline
+would block the event loop, and with it every other request on the
+worker. Searches are handed to a fixed-size thread pool instead, and at
+most SEARCH_QUEUE_DEPTH further searches may wait for a free thread.
+
+Identical searches arriving together are coalesced: the first one runs
+and the others await its result without taking a thread or queue slot.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+from .config import SEARCH_QUEUE_DEPTH, SEARCH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class SearchQueueFull(Exception):
+    """Raised when every search thread is busy and the queue is full"""
+
+
+class SearchExecutor:
+    """Thread pool with bounded concurrency and a bounded wait queue"""
+
+    def __init__(self, max_workers: int, queue_depth: int):
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._slots = threading.BoundedSemaphore(max_workers + queue_depth)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        # Searches running on behalf of every caller with the same key; only
+        # touched from the event loop
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.shared_runs = 0
+        self.coalesced = 0
+
+    def _finish(self) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool and await its result.
+
+        Raises:
+            SearchQueueFull: If max_workers + queue_depth calls are already pending
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Search queue is full, rejecting request")
+            raise SearchQueueFull()
+
+        def task():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # Released when the work ends, even if the caller gave up
+                self._finish()
+
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._pool.submit(task)
+        except Exception:
+            self._finish()
+            raise
+        return await asyncio.wrap_future(future)
+
+    async def run_shared(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run fn like run, unless a call with the same key is already in
+        flight, in which case await that call's result (or exception).
+
+        Callers sharing a result must not mutate it. A caller that goes away
+        does not cancel the call for the others.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self.run(fn, *args, **kwargs))
+        self._in_flight[key] = future
+        self.shared_runs += 1
+
+        def forget(_):
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters describing pool load and request coalescing"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "in_flight_keys": len(self._in_flight),
+                "shared_runs": self.shared_runs,
+                "coalesced": self.coalesced,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+search_executor = SearchExecutor(SEARCH_WORKERS, SEARCH_QUEUE_DEPTH)
@@ -0,0 +1,177 @@
+"""
+Query planning with progressive relaxation
+
+A query is answered by the tightest tier that has any results: first the
+full location, then only its first term (usually the city). Every tier
+reads candidates from one QueryPlan, which matches the dish once and
+resolves the location terms once, narrowing scope by scope, so trying a
+looser tier costs an intersection of already small arrays rather than
+another search.
+
+More tiers can be appended to RELAXATION_TIERS; a tier returns its
+candidate rows, or None when it does not apply to the query.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .highlight_index import normalize_tags
+from .range_index import Range, apply_ranges
+from .restaurant_dataset import RestaurantDataset
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Conditions every candidate must meet besides matching the dish and location"""
+    # Inclusive (column, lo, hi) ranges, see range_index
+    ranges: Tuple[Tuple[str, float, float], ...] = ()
+    # Normalized highlight tags every candidate must have, and must not have
+    require: Tuple[str, ...] = ()
+    exclude: Tuple[str, ...] = ()
+    # Minute of the week (Monday 00:00 is 0) at which candidates must be open
+    open_at: Optional[int] = None
+
+    @classmethod
+    def create(
+        cls,
+        ranges: Optional[Dict[str, Range]] = None,
+        require: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        open_at: Optional[int] = None,
+    ) -> "SearchFilters":
+        """Normalize filters so that equal filters compare and hash equal"""
+        bounds = tuple(sorted((column, lo, hi) for column, (lo, hi) in (ranges or {}).items()))
+        return cls(bounds, normalize_tags(require), normalize_tags(exclude), open_at)
+
+    def apply(self, loaded: RestaurantDataset, rows: np.ndarray) -> np.ndarray:
+        """Keep the sorted rows meeting every filter"""
+        if self.ranges:
+            ranges = {column: (lo, hi) for column, lo, hi in self.ranges}
+            rows = apply_ranges(loaded.range_indexes, ranges, rows)
+        mask = loaded.highlight_index.mask(self.require, self.exclude)
+        if mask is not None:
+            rows = loaded.highlight_index.filter(rows, mask)
+        if self.open_at is not None:
+            rows = loaded.opening_hours.open_rows(rows, self.open_at)
+        return rows
+
+
+NO_FILTERS = SearchFilters()
+
+
+class QueryPlan:
+    """Candidate rows of one normalized query, computed lazily and shared by every tier"""
+
+    def __init__(
+        self,
+        loaded: RestaurantDataset,
+        dish_terms: Tuple[str, ...],
+        location_terms: Tuple[str, ...],
+        dish_phrase: str = "",
+        filters: SearchFilters = NO_FILTERS,
+        location_scopes: Optional[List[np.ndarray]] = None,
+    ):
+        self.loaded = loaded
+        self.dish_terms = dish_terms
+        self.location_terms = location_terms
+        # The whole dish as typed, normalized, to match multi-word cuisines exactly
+        self.dish_phrase = dish_phrase
+        self.filters = filters
+        self._location_scopes = location_scopes
+        self._dish_rows: Optional[np.ndarray] = None
+        self._candidates: Dict[int, np.ndarray] = {}
+
+    def for_dish(self, dish_terms: Tuple[str, ...], dish_phrase: str = "",
+                 filters: Optional[SearchFilters] = None) -> "QueryPlan":
+        """
+        Plan another dish in the same location, reusing its resolved scopes.
+
+        The new plan keeps these filters unless others are given.
+        """
+        filters = self.filters if filters is None else filters
+        return QueryPlan(self.loaded, dish_terms, self.location_terms, dish_phrase, filters, self._location_scopes)
+
+    @property
+    def key(self) -> Tuple:
+        """Identifies the query's candidate rows, for result caching"""
+        return self.dish_terms, self.dish_phrase, self.location_terms, self.filters
+
+    @property
+    def location_scopes(self) -> List[np.ndarray]:
+        """Rows matching the first 1, 2, ... n location terms"""
+        if self._location_scopes is None:
+            self._location_scopes = self.loaded.location_index.resolve_scopes(list(self.location_terms))
+        return self._location_scopes
+
+    @property
+    def dish_rows(self) -> np.ndarray:
+        """Rows where any dish term prefixes a cuisine or name token"""
+        if self._dish_rows is None:
+            matches = [self.loaded.dish_index.match(term) for term in self.dish_terms]
+            if len(matches) == 1:
+                rows = matches[0]
+            elif matches:
+                # Sort and drop repeats; cheaper than np.union1d's hashing
+                rows = np.sort(np.concatenate(matches))
+                rows = rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+            else:
+                rows = np.zeros(0, dtype=np.int32)
+            self._dish_rows = rows
+        return self._dish_rows
+
+    def candidates(self, depth: int) -> np.ndarray:
+        """
+        Dish rows meeting the filters within the scope of the first depth
+        location terms.
+
+        Each depth is derived from the one above it, so all of them together
+        cost one dish/location intersection, on rows already narrowed by
+        the filters.
+        """
+        if depth not in self._candidates:
+            if depth == 0:
+                rows = self.filters.apply(self.loaded, self.dish_rows)
+            else:
+                rows = np.intersect1d(
+                    self.candidates(depth - 1), self.location_scopes[depth - 1], assume_unique=True
+                )
+            self._candidates[depth] = rows
+        return self._candidates[depth]
+
+
+@dataclass(frozen=True)
+class RelaxationTier:
+    """One scope a query may be answered in"""
+    name: str
+    candidates: Callable[[QueryPlan], Optional[np.ndarray]]
+
+
+def _full_location(plan: QueryPlan) -> Optional[np.ndarray]:
+    return plan.candidates(len(plan.location_terms))
+
+
+def _first_location_term(plan: QueryPlan) -> Optional[np.ndarray]:
+    if len(plan.location_terms) < 2:
+        return None
+    return plan.candidates(1)
+
+
+# Tried in order; the first tier with any candidates answers the query
+RELAXATION_TIERS: List[RelaxationTier] = [
+    RelaxationTier("location", _full_location),
+    RelaxationTier("city", _first_location_term),
+]
+STRICT_TIERS: List[RelaxationTier] = RELAXATION_TIERS[:1]
+
+
+def run_plan(plan: QueryPlan, tiers: Sequence[RelaxationTier]) -> Tuple[np.ndarray, Optional[str]]:
+    """
+    Return the candidates of the tightest non-empty tier and its name,
+    or no rows and None when every tier is empty.
+    """
+    for tier in tiers:
+        rows = tier.candidates(plan)
+        if rows is not None and len(rows) > 0:
+            return rows, tier.name
+    return np.zeros(0, dtype=np.int64), None
@@ -0,0 +1,154 @@
+"""
+Prefix autocomplete over dishes, cities and localities
+"""
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .location_index import LocationIndex, normalize_place
+from .restaurant_table import RestaurantTable
+from .text_index import TokenIndex, normalize_phrase
+
+# Sorts after every character that can appear in a key
+_PREFIX_END = "\U0010ffff"
+
+
+class SuggestIndex:
+    """
+    Sorted normalized keys with a popularity rank per key.
+
+    Keys sharing a prefix are one contiguous range, found by binary search.
+    A sparse table of range maxima over the popularity ranks then yields
+    the most popular keys of that range one at a time, so a lookup costs
+    O(log n + k log k) however many keys share the prefix.
+    """
+
+    def __init__(self, keys: List[str], labels: List[str], popularity: np.ndarray):
+        self.keys = keys
+        self.labels = labels
+        self.popularity = popularity
+        # best[j][i] is the most popular position in keys[i:i + 2**j]
+        self._best = [np.arange(len(keys), dtype=np.int32)]
+        width = 1
+        while 2 * width <= len(keys):
+            previous = self._best[-1]
+            left, right = previous[:-width], previous[width:]
+            self._best.append(np.where(popularity[left] >= popularity[right], left, right))
+            width *= 2
+
+    @classmethod
+    def build(cls, entries: Dict[str, Tuple[str, int, int]]) -> "SuggestIndex":
+        """
+        Index entries mapping a normalized key to its display label,
+        restaurant count and total votes; popularity orders by count, then votes.
+        """
+        keys = sorted(key for key in entries if key)
+        labels = [entries[key][0] for key in keys]
+        counts = np.array([entries[key][1] for key in keys], dtype=np.int64)
+        votes = np.array([entries[key][2] for key in keys], dtype=np.int64)
+        popularity = np.empty(len(keys), dtype=np.int32)
+        popularity[np.lexsort((votes, counts))] = np.arange(len(keys), dtype=np.int32)
+        return cls(keys, labels, popularity)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _most_popular(self, lo: int, hi: int) -> int:
+        """Position of the most popular key in keys[lo:hi]"""
+        level = (hi - lo).bit_length() - 1
+        left, right = self._best[level][lo], self._best[level][hi - (1 << level)]
+        return int(left if self.popularity[left] >= self.popularity[right] else right)
+
+    def suggest(self, prefix: str, limit: int) -> List[str]:
+        """Labels of the limit most popular keys starting with prefix"""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _PREFIX_END, lo)
+        ranges = []
+        if lo < hi:
+            best = self._most_popular(lo, hi)
+            ranges.append((-int(self.popularity[best]), best, lo, hi))
+        labels = []
+        while ranges and len(labels) < limit:
+            _, best, lo, hi = heapq.heappop(ranges)
+            labels.append(self.labels[best])
+            for part_lo, part_hi in ((lo, best), (best + 1, hi)):
+                if part_lo < part_hi:
+                    part_best = self._most_popular(part_lo, part_hi)
+                    heapq.heappush(ranges, (-int(self.popularity[part_best]), part_best, part_lo, part_hi))
+        return labels
+
+
+class Suggestions:
+    """Autocomplete indexes computed once per dataset"""
+
+    FIELDS = ("dish", "city", "locality")
+
+    def __init__(self, dishes: SuggestIndex, cities: SuggestIndex,
+                 localities: SuggestIndex, city_localities: Dict[str, SuggestIndex]):
+        self.dishes = dishes
+        self.cities = cities
+        self.localities = localities
+        self._city_localities = city_localities
+
+    @classmethod
+    def build(cls, table: RestaurantTable, location_index: LocationIndex,
+              cuisine_entries: TokenIndex) -> "Suggestions":
+        """Weigh cuisines, cities and localities by their restaurants and votes"""
+        votes = table["votes"].astype(np.int64)
+
+        # Cuisine entries are already normalized; postings are contiguous
+        counts = np.diff(cuisine_entries.starts)
+        totals = np.zeros(len(counts), dtype=np.int64)
+        if len(cuisine_entries.rows):
+            totals = np.add.reduceat(votes[cuisine_entries.rows], cuisine_entries.starts[:-1])
+        dishes = {
+            token: (token, int(count), int(total))
+            for token, count, total in zip(cuisine_entries.tokens, counts, totals)
+        }
+
+        def entry(label: str, rows: np.ndarray) -> Tuple[str, int, int]:
+            return label.strip(), len(rows), int(votes[rows].sum())
+
+        locations, locality_names = table["location"], table["locality"]
+        cities = {
+            key: entry(locations[rows[0]].split(",")[0], rows)
+            for key, rows in location_index.cities.items()
+        }
+        localities = {
+            key: entry(locality_names[rows[0]], rows)
+            for key, rows in location_index.all_localities.items()
+        }
+        city_localities = {
+            city: SuggestIndex.build({
+                key: entry(locality_names[rows[0]], rows)
+                for key, rows in by_locality.items()
+            })
+            for city, by_locality in location_index.localities.items()
+        }
+        return cls(
+            SuggestIndex.build(dishes),
+            SuggestIndex.build(cities),
+            SuggestIndex.build(localities),
+            city_localities,
+        )
+
+    def suggest(self, field: str, prefix: str, limit: int = 8, city: Optional[str] = None) -> List[str]:
+        """
+        Suggest completions of prefix for a field of FIELDS, most popular first.
+
+        Localities are limited to those of city when it is given.
+        """
+        if field == "dish":
+            return self.dishes.suggest(normalize_phrase(prefix), limit)
+        prefix = normalize_place(prefix)
+        if field == "city":
+            index = self.cities
+        elif city:
+            index = self._city_localities.get(normalize_place(city))
+            if index is None:
+                return []
+        else:
+            index = self.localities
+        return index.suggest(prefix, limit)
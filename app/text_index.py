@@ -0,0 +1,165 @@
+"""
+Inverted token index over restaurant text columns
+"""
+import re
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .restaurant_table import Column, StringColumn, TextColumn
+
+# Runs of letters/digits; everything else separates tokens
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Sorts after every character that can appear in a token
+_PREFIX_END = "\U0010ffff"
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-cased alphanumeric tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_phrase(text: str) -> str:
+    """Normalize text to its tokens joined by single spaces"""
+    return " ".join(tokenize(text))
+
+
+def split_entries(text: str) -> List[str]:
+    """Split a comma separated list (such as cuisines) into normalized entries"""
+    return [normalize_phrase(entry) for entry in text.split(",")]
+
+
+def rows_by_code(codes: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group row ids by code in CSR layout: the rows of code c are
+    rows[starts[c]:starts[c + 1]], in ascending order.
+    """
+    rows = np.argsort(codes, kind="stable").astype(np.int32)
+    starts = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=count), out=starts[1:])
+    return starts, rows
+
+
+def scatter_rows(codes: np.ndarray, count: int, value_codes: np.ndarray, ids: np.ndarray
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expand (value code, id) pairs to one (id, row) pair per row whose code
+    is that value code.
+
+    Returns:
+        The ids and rows of the expanded pairs
+    """
+    starts, rows = rows_by_code(codes, count)
+    lengths = starts[value_codes + 1] - starts[value_codes]
+    ends = np.cumsum(lengths)
+    total = int(ends[-1]) if len(ends) else 0
+    within = np.arange(total) - np.repeat(ends - lengths, lengths)
+    return np.repeat(ids, lengths), rows[np.repeat(starts[value_codes], lengths) + within]
+
+
+class TokenIndex:
+    """
+    Maps normalized tokens to sorted row-id posting lists.
+
+    Postings are stored in CSR layout: the vocabulary is sorted, and the
+    rows of token i are rows[starts[i]:starts[i + 1]]. All tokens sharing a
+    prefix are therefore one contiguous slice of rows.
+    """
+
+    def __init__(self, tokens: List[str], starts: np.ndarray, rows: np.ndarray):
+        self.tokens = tokens
+        self.starts = starts
+        self.rows = rows
+
+    @classmethod
+    def build(cls, columns: Sequence[TextColumn], tokenizer: Callable[[str], List[str]] = tokenize) -> "TokenIndex":
+        """
+        Index the tokens of the table text columns, using row positions as
+        row ids; a row has every token of each of its values.
+
+        Each distinct value is tokenized once and its postings are scattered
+        to the rows holding it.
+        """
+        vocabulary: Dict[str, int] = {}
+        token_ids, token_rows = [], []
+        size = 0
+        for column in columns:
+            codes, values = column.factorize()
+            size = len(codes)
+            value_codes, value_tokens = [], []
+            for code, value in enumerate(values):
+                for token in set(tokenizer(value)):
+                    value_codes.append(code)
+                    value_tokens.append(vocabulary.setdefault(token, len(vocabulary)))
+            ids, rows = scatter_rows(
+                codes, len(values), np.array(value_codes, dtype=np.int64), np.array(value_tokens, dtype=np.int64)
+            )
+            token_ids.append(ids)
+            token_rows.append(rows)
+
+        tokens = sorted(vocabulary)
+        rank = np.empty(len(tokens), dtype=np.int64)
+        rank[[vocabulary[t] for t in tokens]] = np.arange(len(tokens))
+
+        # Sorting (token, row) keys orders rows within each token; rows
+        # having a token in more than one column are then adjacent repeats
+        keys = rank[np.concatenate(token_ids)] * size + np.concatenate(token_rows)
+        keys.sort()
+        if len(columns) > 1 and len(keys):
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        starts = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // max(size, 1), minlength=len(tokens)), out=starts[1:])
+        return cls(tokens, starts, (keys % max(size, 1)).astype(np.int32))
+
+    def to_columns(self, name: str) -> Dict[str, Column]:
+        """The index as columns named "<name>.<part>", for the dataset snapshot"""
+        return {
+            f"{name}.tokens": StringColumn.from_values(self.tokens),
+            f"{name}.starts": self.starts,
+            f"{name}.rows": self.rows,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Column], name: str) -> "TokenIndex":
+        """Open an index stored by to_columns; starts and rows stay memory-mapped"""
+        return cls(list(columns[f"{name}.tokens"]), columns[f"{name}.starts"], columns[f"{name}.rows"])
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Return the [lo, hi) vocabulary positions of tokens starting with prefix"""
+        lo = bisect_left(self.tokens, prefix)
+        hi = bisect_left(self.tokens, prefix + _PREFIX_END, lo)
+        return lo, hi
+
+    def postings(self, token: str) -> np.ndarray:
+        """Return the rows containing exactly this token"""
+        lo, hi = self.prefix_range(token)
+        if lo == hi or self.tokens[lo] != token:
+            return self.rows[:0]
+        return self.rows[self.starts[lo]:self.starts[lo + 1]]
+
+    def prefix_rows(self, prefix: str) -> np.ndarray:
+        """Return the sorted rows containing any token that starts with prefix"""
+        lo, hi = self.prefix_range(prefix)
+        if hi - lo == 1:
+            return self.rows[self.starts[lo]:self.starts[hi]]
+        return np.unique(self.rows[self.starts[lo]:self.starts[hi]])
+
+    def match(self, term: str) -> np.ndarray:
+        """
+        Return the sorted rows matching every token of term by prefix.
+
+        "biry" matches rows containing "Biryani"; "north ind" matches rows
+        containing both a "north…" and an "ind…" token.
+        """
+        result = None
+        for token in tokenize(term):
+            rows = self.prefix_rows(token)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return self.rows[:0] if result is None else result
@@ -0,0 +1,27 @@
+"""
+Compile the restaurant dataset into its binary snapshot
+
+Run this offline (e.g. during deployment) so that application workers
+start from the snapshot instead of parsing the CSV:
+
+    python compile_dataset.py [path/to/zomato_restaurants_in_India.csv] [--force]
+"""
+import argparse
+import logging
+import sys
+
+from app.restaurant_service import compile_dataset
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compile the restaurant dataset snapshot")
+    parser.add_argument("csv", nargs="?", help="Dataset CSV (defaults to the configured dataset)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the snapshot is up to date")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return 0 if compile_dataset(args.csv, force=args.force) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
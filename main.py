@@ -10,9 +10,13 @@ import logging
 import sys
 import os
 
-from app.config import APP_NAME, DEBUG, HOST, PORT
+from app.config import APP_NAME, DATASET_SNAPSHOT_DIR, DEBUG, HOST, PORT, WORKERS
 from app.database import db
+from app.dataset_watcher import dataset_watcher
+from app.restaurant_service import load_data
+from app.restaurant_table import process_memory
 from app.routes import auth_router, main_router
+from app.search_executor import search_executor
 
 # Configure logging
 logging.basicConfig(
@@ -60,11 +64,24 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error creating database indexes: {str(e)}")
 
+    # Map the restaurant dataset before serving the first search
+    if load_data() is not None:
+        memory = process_memory(mapped_prefix=DATASET_SNAPSHOT_DIR)
+        if memory.get("available"):
+            logger.info(
+                f"Worker {memory['pid']} memory: private={memory['private'] // 2**20} MiB, "
+                f"shared={memory['shared'] // 2**20} MiB, dataset mapped={memory['dataset_rss'] // 2**20} MiB"
+            )
+    # Picks up a refreshed export without restarting the worker
+    dataset_watcher.start()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info(f"Shutting down {APP_NAME}")
+    dataset_watcher.stop()
+    search_executor.shutdown()
 
 
 if __name__ == "__main__":
@@ -73,6 +90,8 @@ if __name__ == "__main__":
         "main:app",
         host=HOST,
         port=PORT,
-        reload=DEBUG,
+        # uvicorn ignores workers when reloading, so reload only a single worker
+        reload=DEBUG and WORKERS == 1,
+        workers=WORKERS,
         log_level="debug" if DEBUG else "info"
     )